@@ -1,11 +1,10 @@
 import streamlit as st
 import pandas as pd
-from ortools.sat.python import cp_model
-import math
-import re
-from collections import defaultdict
 import os
 
+from slot_calendar import to_minutes
+from ui_assets import APP_CSS, CALENDAR, existing_default_files
+
 # ==========================================
 # PAGE CONFIG
 # ==========================================
@@ -15,26 +14,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# ==========================================
-# DEFAULT DATA FILES
-# ==========================================
-DEFAULT_FILES = {
-    'room': 'room.csv',
-    'teacher_courses': 'teacher_courses.csv',
-    'ai_in': 'ai_in_courses.csv',
-    'cy_in': 'cy_in_courses.csv',
-    'all_teachers': 'all_teachers.csv',
-    'ai_out': 'ai_out_courses.csv',
-    'cy_out': 'cy_out_courses.csv'
-}
-
 def check_default_files():
     """ตรวจสอบว่ามีไฟล์ default อยู่หรือไม่"""
-    existing = {}
-    for key, filename in DEFAULT_FILES.items():
-        if os.path.exists(filename):
-            existing[key] = filename
-    return existing
+    return existing_default_files()
 
 def load_file(uploaded_file, default_path=None):
     """โหลดไฟล์จาก upload หรือ default"""
@@ -44,408 +26,176 @@ def load_file(uploaded_file, default_path=None):
         return default_path
     return None
 
-# Custom CSS
-st.markdown("""
-<style>
-    .main-header {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        padding: 2rem;
-        border-radius: 10px;
-        margin-bottom: 2rem;
-        color: white;
-        text-align: center;
-    }
-    .tt-container { 
-        overflow-x: auto; 
-        font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-        margin-top: 20px;
-        box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-        border-radius: 8px;
-    }
-    .tt-table { 
-        width: 100%; 
-        border-collapse: collapse; 
-        min-width: 1200px;
-        background: white;
-    }
-    .tt-table th { 
-        background-color: #2c3e50 !important; 
-        color: white !important; 
-        border: 1px solid #34495e; 
-        text-align: center; 
-        padding: 12px 8px; 
-        font-size: 13px;
-        font-weight: 600;
-        position: sticky;
-        top: 0;
-        z-index: 11;
-    }
-    .tt-table td { 
-        border: 1px solid #dee2e6; 
-        text-align: center; 
-        padding: 4px; 
-        height: 80px;
-        background-color: #ffffff;
-    }
-    .tt-day { 
-        background-color: #34495e !important; 
-        color: white !important; 
-        font-weight: bold !important; 
-        width: 100px; 
-        position: sticky; 
-        left: 0; 
-        z-index: 12; 
-        border-right: 3px solid #2c3e50 !important; 
-        font-size: 14px;
-    }
-    .class-box { 
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        border-radius: 8px; 
-        padding: 8px; 
-        height: 95%; 
-        display: flex; 
-        flex-direction: column; 
-        justify-content: center; 
-        color: white !important; 
-        box-shadow: 0 2px 8px rgba(0,0,0,0.15);
-        font-size: 11px; 
-        line-height: 1.4;
-        transition: transform 0.2s;
-    }
-    .class-box:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 12px rgba(0,0,0,0.2);
-    }
-    .c-code { 
-        font-weight: 700; 
-        font-size: 13px; 
-        color: #ffffff !important;
-        text-shadow: 1px 1px 2px rgba(0,0,0,0.2);
-        margin-bottom: 4px;
-    }
-    .teacher-badge {
-        background-color: rgba(255,255,255,0.2);
-        padding: 2px 6px;
-        border-radius: 4px;
-        font-size: 10px;
-        margin-top: 4px;
-    }
-    .ext-time-badge {
-        background-color: #e74c3c;
-        color: white;
-        padding: 2px 6px;
-        border-radius: 3px;
-        font-size: 9px;
-        font-weight: bold;
-        margin-top: 4px;
-    }
-    .success-box {
-        background-color: #d4edda;
-        border: 1px solid #c3e6cb;
-        color: #155724;
-        padding: 1rem;
-        border-radius: 8px;
-        margin: 1rem 0;
-    }
-    .info-box {
-        background-color: #d1ecf1;
-        border: 1px solid #bee5eb;
-        color: #0c5460;
-        padding: 1rem;
-        border-radius: 8px;
-        margin: 1rem 0;
-    }
-    .stButton>button {
-        width: 100%;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        border: none;
-        padding: 0.75rem 1.5rem;
-        font-size: 16px;
-        font-weight: 600;
-        border-radius: 8px;
-        transition: all 0.3s;
-    }
-    .stButton>button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 6px 20px rgba(102, 126, 234, 0.4);
-    }
-</style>
-""", unsafe_allow_html=True)
+# Custom CSS (สร้างครั้งเดียวต่อ process ใน ui_assets)
+st.markdown(APP_CSS, unsafe_allow_html=True)
 
 # ==========================================
 # HELPER FUNCTIONS
 # ==========================================
-def get_slot_map():
-    """สร้าง mapping ของช่วงเวลา 30 นาที"""
-    slots = {}
-    t_start = 8.5
-    idx = 0
-    while t_start <= 19.5:
-        h, m = int(t_start), round((t_start % 1) * 60)
-        slots[idx] = {
-            'time': f"{h:02d}:{m:02d}", 
-            'val': t_start, 
-            'is_lunch': (12.5 <= t_start < 13.0)
-        }
-        idx += 1
-        t_start += 0.5
-    return slots
-
-def time_to_slot_index(time_str, slot_inv):
-    """แปลงเวลาเป็น slot index"""
-    time_str = str(time_str).strip().replace('.', ':')
-    match = re.search(r"(\d{1,2}):(\d{2})", time_str)
-    if match:
-        h, m = match.groups()
-        formatted = f"{int(h):02d}:{int(m):02d}"
-        return slot_inv.get(formatted, -1)
-    return -1
-
-def parse_unavailable_time(input_val, days_list, slot_inv):
-    """แปลงเวลาว่างของอาจารย์"""
-    un_slots = {d: set() for d in range(len(days_list))}
-    if pd.isna(input_val) or not input_val:
-        return un_slots
-    
-    items = input_val if isinstance(input_val, list) else [str(input_val)]
-    for item in items:
-        match = re.search(r"(\w{3})\s+(\d{1,2}[:.]\d{2})-(\d{1,2}[:.]\d{2})", str(item))
-        if match:
-            day_abbr, start_t, end_t = match.groups()
-            if day_abbr in days_list:
-                d_idx = days_list.index(day_abbr)
-                s_i = time_to_slot_index(start_t, slot_inv)
-                e_i = time_to_slot_index(end_t, slot_inv)
-                if s_i != -1 and e_i != -1:
-                    for s in range(s_i, e_i):
-                        un_slots[d_idx].add(s)
-    return un_slots
+def validate_inputs(files):
+    """ตรวจสอบ schema ของไฟล์ก่อนส่งเข้า solver คืนรายการข้อผิดพลาดรายแถว"""
+    from dataset_cache import DatasetError, load_datasets
+    try:
+        load_datasets(files)
+    except DatasetError as e:
+        return e.errors
+    return []
 
 # ==========================================
 # SOLVER ENGINE
 # ==========================================
-def calculate_schedule(files, mode, solver_time, penalty_val):
-    """คำนวณตารางเรียนโดยใช้ OR-Tools CP-SAT Solver"""
-    
-    SLOT_MAP = get_slot_map()
-    DAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri']
-    SLOT_INV = {v['time']: k for k, v in SLOT_MAP.items()}
-    TOTAL_SLOTS = len(SLOT_MAP)
-
+def calculate_schedule(files, mode, solver_time, penalty_val, engine="joint"):
+    """คำนวณตารางเรียนด้วย scheduler_engine (OR-Tools CP-SAT หรือ Greedy)"""
+    from scheduler_engine import calculate_schedule as engine_schedule  # โหลด OR-Tools เมื่อกดคำนวณเท่านั้น
     try:
-        # โหลดข้อมูล
-        df_room = pd.read_csv(files['room'])
-        room_list = df_room.to_dict('records')
-        room_list.append({'room': 'Online', 'capacity': 9999, 'type': 'virtual'})
+        return engine_schedule(files, mode, solver_time, penalty_val, engine=engine, calendar=CALENDAR)
+    except Exception as e:
+        st.error(f"❌ เกิดข้อผิดพลาด: {e}")
+        return None
+
+# ==========================================
+# RESULT VIEWS
+# ==========================================
+def download_payload(df_res):
+    """CSV bytes ของผลลัพธ์ encode ครั้งเดียวต่อผลลัพธ์ แล้วเก็บใน session_state (rerun ไม่ต้อง encode ใหม่)"""
+    if st.session_state.get('res_csv') is None:
+        from result_writer import encode
+        st.session_state['res_csv'] = encode(df_res)
+    return st.session_state['res_csv']
+
+def render_timetable(df_res):
+    """ตารางรายอาจารย์/รายห้อง + ปุ่มดาวน์โหลด"""
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        view_mode = st.radio(
+            "🔍 เลือกมุมมอง:",
+            ["👨‍🏫 รายอาจารย์ (Teacher View)", "🏫 รายห้อง (Room View)"],
+            horizontal=True
+        )
+    
+    if view_mode == "👨‍🏫 รายอาจารย์ (Teacher View)":
+        all_teachers = sorted(list(set([
+            i.strip() 
+            for s in df_res['Teacher'] 
+            for i in str(s).split(',') 
+            if i.strip() != '-' and i.strip() != 'Unknown'
+        ])))
         
-        df_tc = pd.read_csv(files['teacher_courses'])
-        df_courses = pd.concat([
-            pd.read_csv(files['ai_in']), 
-            pd.read_csv(files['cy_in'])
-        ], ignore_index=True).fillna(0)
+        if not all_teachers:
+            st.warning("⚠️ ไม่พบข้อมูลอาจารย์ในตาราง")
+            return
         
-        df_teacher = pd.read_csv(files['all_teachers'])
-
-        # สร้าง mapping อาจารย์-วิชา
-        t_map = defaultdict(list)
-        for _, row in df_tc.iterrows():
-            t_map[str(row['course_code']).strip()].append(
-                str(row['teacher_id']).strip()
-            )
+        with col2:
+            target = st.selectbox("🔎 เลือกอาจารย์:", all_teachers)
         
-        # สร้าง mapping เวลาว่างของอาจารย์
-        un_map = {
-            str(row['teacher_id']).strip(): parse_unavailable_time(
-                row.get('unavailable_times'), DAYS, SLOT_INV
-            ) 
-            for _, row in df_teacher.iterrows()
-        }
-
-        # 1. Fixed Tasks
-        fixed_tasks = []
-        for key in ['ai_out', 'cy_out']:
-            if files[key]:
-                df_f = pd.read_csv(files[key])
-                for _, r in df_f.iterrows():
-                    d_i = DAYS.index(str(r['day'])[:3]) if str(r['day'])[:3] in DAYS else -1
-                    s_i = time_to_slot_index(r['start'], SLOT_INV)
-                    dur = int(math.ceil((r.get('lecture_hour', 0) + r.get('lab_hour', 0)) * 2))
-                    
-                    if d_i != -1 and s_i != -1:
-                        fixed_tasks.append({
-                            'uid': f"FIX_{r['course_code']}_S{r['section']}",
-                            'id': str(r['course_code']), 
-                            'sec': int(r['section']), 
-                            'dur': dur, 
-                            'type': 'Fixed',
-                            'tea': t_map.get(str(r['course_code']).strip(), ['-']),
-                            'fixed_room': True, 
-                            'target_room': str(r['room']), 
-                            'f_d': d_i, 
-                            'f_s': s_i
-                        })
-
-        # 2. Dynamic Tasks
-        tasks = []
-        for _, row in df_courses.iterrows():
-            c, s = str(row['course_code']).strip(), int(row['section'])
-            tea = t_map.get(c, ['Unknown'])
-            opt = row.get('optional', 1)
-            
-            # Lecture
-            lec_slots = int(math.ceil(row['lecture_hour'] * 2))
-            p = 1
-            while lec_slots > 0:
-                dur = min(lec_slots, 6)
-                uid = f"{c}_S{s}_Lec_P{p}"
-                if not any(tk['uid'] == uid for tk in fixed_tasks):
-                    tasks.append({
-                        'uid': uid, 
-                        'id': c, 
-                        'sec': s, 
-                        'type': 'Lec', 
-                        'dur': dur, 
-                        'std': row['enrollment_count'], 
-                        'tea': tea, 
-                        'opt': opt, 
-                        'online': row.get('lec_online') == 1
-                    })
-                lec_slots -= dur
-                p += 1
-            
-            # Lab
-            lab_dur = int(math.ceil(row['lab_hour'] * 2))
-            if lab_dur > 0:
-                uid = f"{c}_S{s}_Lab"
-                if not any(tk['uid'] == uid for tk in fixed_tasks):
-                    tasks.append({
-                        'uid': uid, 
-                        'id': c, 
-                        'sec': s, 
-                        'type': 'Lab', 
-                        'dur': lab_dur, 
-                        'std': row['enrollment_count'], 
-                        'tea': tea, 
-                        'opt': opt, 
-                        'online': row.get('lab_online') == 1
-                    })
-
-        # 3. CP-SAT Model
-        model = cp_model.CpModel()
-        vars_dict = {}
-        is_sched = {}
-        task_vars = {}
-        room_lookup = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
-        tea_lookup = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
-        obj_terms = []
-        pen_terms = []
-
-        for t in (fixed_tasks + tasks):
-            uid = t['uid']
-            is_sched[uid] = model.NewBoolVar(f"sc_{uid}")
-            t_d = model.NewIntVar(0, 4, f"d_{uid}")
-            t_s = model.NewIntVar(0, TOTAL_SLOTS-1, f"s_{uid}")
-            model.Add(model.NewIntVar(0, TOTAL_SLOTS+2, f"e_{uid}") == t_s + t['dur'])
-            task_vars[uid] = {'d': t_d, 's': t_s}
-            
-            if t.get('fixed_room'):
-                model.Add(t_d == t['f_d'])
-                model.Add(t_s == t['f_s'])
-
-            for r in room_list:
-                if t.get('online') and r['room'] != 'Online':
-                    continue
-                if not t.get('online') and (r['room'] == 'Online' or r['capacity'] < t.get('std', 0)):
-                    continue
-                if t.get('fixed_room') and r['room'] != t['target_room']:
-                    continue
-                if t.get('type') == 'Lab' and 'lab' not in str(r.get('type', '')).lower():
-                    continue
-
-                for di in range(5):
-                    for si in range(TOTAL_SLOTS - t['dur']):
-                        sv = SLOT_MAP[si]['val']
-                        ev = sv + t['dur'] * 0.5
-                        
-                        if mode == 1 and (sv < 9.0 or ev > 16.0):
-                            continue
-                        
-                        if any(SLOT_MAP[si+i]['is_lunch'] for i in range(t['dur'])):
-                            continue
-                        
-                        if any(tid in un_map and si+i in un_map[tid][di] 
-                               for tid in t['tea'] for i in range(t['dur'])):
-                            continue
-
-                        v = model.NewBoolVar(f"{uid}_{r['room']}_{di}_{si}")
-                        vars_dict[(uid, r['room'], di, si)] = v
-                        model.Add(t_d == di).OnlyEnforceIf(v)
-                        model.Add(t_s == si).OnlyEnforceIf(v)
-                        
-                        if mode == 2 and (sv < 9.0 or ev > 16.0):
-                            pen_terms.append(v * penalty_val)
-                        
-                        for i in range(t['dur']):
-                            room_lookup[r['room']][di][si+i].append(v)
-                            for tid in t['tea']:
-                                tea_lookup[tid][di][si+i].append(v)
-
-            model.Add(sum(vars_dict[k] for k in vars_dict if k[0] == uid) == 1).OnlyEnforceIf(is_sched[uid])
-            
-            weight = 1000000 if t.get('fixed_room') else (1000 if t.get('opt') == 0 else 100)
-            obj_terms.append(is_sched[uid] * weight)
-
-        for lookup in [room_lookup, tea_lookup]:
-            for k in lookup:
-                for d in lookup[k]:
-                    for s in lookup[k][d]:
-                        if len(lookup[k][d][s]) > 1:
-                            model.Add(sum(lookup[k][d][s]) <= 1)
-
-        model.Maximize(sum(obj_terms) - sum(pen_terms))
+        filt_df = df_res[df_res['Teacher'].str.contains(target, na=False)]
+        
+        if filt_df.empty:
+            st.info(f"ℹ️ ไม่พบตารางสอนสำหรับ {target}")
+            return
         
-        solver = cp_model.CpSolver()
-        solver.parameters.max_time_in_seconds = solver_time
-        status = solver.Solve(model)
+        st.markdown(f"""
+        <div class='info-box'>
+            <strong>📊 สถิติการสอน:</strong><br>
+            • จำนวนคาบสอนทั้งหมด: {len(filt_df)} คาบ<br>
+            • จำนวนวิชา: {filt_df['Course'].nunique()} วิชา
+        </div>
+        """, unsafe_allow_html=True)
+        
+    else:
+        with col2:
+            target = st.selectbox("🔎 เลือกห้อง:", sorted(df_res['Room'].unique()))
+        
+        filt_df = df_res[df_res['Room'] == target]
+        
+        if filt_df.empty:
+            st.info(f"ℹ️ ไม่พบตารางสำหรับห้อง {target}")
+            return
 
-        res_final = []
-        if status in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
-            for t in (fixed_tasks + tasks):
-                uid = t['uid']
-                if solver.Value(is_sched[uid]):
-                    d = solver.Value(task_vars[uid]['d'])
-                    s = solver.Value(task_vars[uid]['s'])
-                    
-                    room_name = "Unknown"
-                    for k, v in vars_dict.items():
-                        if k[0] == uid and k[2] == d and k[3] == s and solver.Value(v):
-                            room_name = k[1]
-                            break
-                    
-                    start_val = SLOT_MAP[s]['val']
-                    end_val = SLOT_MAP[s + t['dur'] - 1]['val']
-                    is_extended = start_val < 9.0 or end_val >= 16.0
-                    
-                    res_final.append({
-                        'Day': DAYS[d],
-                        'Start': SLOT_MAP[s]['time'],
-                        'End': SLOT_MAP[s + t['dur']]['time'],
-                        'Room': room_name,
-                        'Course': t['id'],
-                        'Sec': t['sec'],
-                        'Type': t.get('type', '-'),
-                        'Teacher': ",".join(t['tea']),
-                        'Note': "Extended Time" if is_extended else ""
-                    })
-            
-            return pd.DataFrame(res_final)
+    days_map = {
+        'Mon': 'จันทร์',
+        'Tue': 'อังคาร',
+        'Wed': 'พุธ',
+        'Thu': 'พฤหัสบดี',
+        'Fri': 'ศุกร์',
+        'Sat': 'เสาร์',
+        'Sun': 'อาทิตย์'
+    }
+    
+    time_headers = CALENDAR['times'][:-1]
+    step = CALENDAR['slot_minutes']
+    
+    html = "<div class='tt-container'><table class='tt-table'>"
+    html += "<tr><th style='width: 100px;'>Day</th>"
+    for t in time_headers:
+        html += f"<th style='min-width: 70px;'>{t}</th>"
+    html += "</tr>"
+    
+    for day in CALENDAR['days']:
+        html += f"<tr><td class='tt-day'>{days_map.get(day, day)}</td>"
+        d_data = filt_df[filt_df['Day'] == day]
+        curr = 0
         
-        return None
+        while curr < CALENDAR['n_slots']:
+            t_str = CALENDAR['times'][curr]
+            match = d_data[d_data['Start'] == t_str]
+            
+            if not match.empty:
+                r = match.iloc[0]
+                span = max(1, (to_minutes(r['End']) - to_minutes(r['Start'])) // step)
+                
+                html += f"<td colspan='{span}'><div class='class-box'>"
+                html += f"<div class='c-code'>{r['Course']}</div>"
+                html += f"<div>Section {r['Sec']} - {r['Type']}</div>"
+                html += f"<div class='teacher-badge'>{r['Teacher']}</div>"
+                html += f"<div style='font-size:10px;margin-top:2px;'>🏫 {r['Room']}</div>"
+                if r['Note']:
+                    html += f"<div class='ext-time-badge'>{r['Note']}</div>"
+                html += "</div></td>"
+                curr += span
+            else:
+                html += "<td></td>"
+                curr += 1
         
-    except Exception as e:
-        st.error(f"❌ เกิดข้อผิดพลาด: {e}")
-        return None
+        html += "</tr>"
+    
+    html += "</table></div>"
+    
+    st.markdown(html, unsafe_allow_html=True)
+    
+    st.divider()
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col2:
+        st.download_button(
+            label="📥 Download ตารางเรียน (CSV)",
+            data=download_payload(df_res),
+            file_name=f"schedule_{target.replace(' ', '_')}.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
+
+def render_dashboard(df_res):
+    """สรุปคุณภาพตาราง: การใช้ห้อง, ภาระสอน, ช่วงว่าง, วิชาที่จัดไม่ได้"""
+    from schedule_analytics import analyze, to_json
+    report = analyze(df_res, CALENDAR)
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("การใช้ห้อง", f"{report['rooms']['utilization']:.0%}")
+    c2.metric("Ext.Time", report['ext_time']['count'])
+    c3.metric("ชั่วโมงว่างระหว่างคาบ (รวม)", report['idle_hours_total'])
+    c4.metric("จัดไม่ได้", len(report['unscheduled']))
+
+    st.markdown("**🏫 การใช้ห้อง (สัดส่วนคาบที่เปิดสอน)**")
+    st.bar_chart(pd.Series(report['rooms']['per_room'], name="utilization"))
+    st.markdown("**👨‍🏫 ภาระสอนรายอาจารย์**")
+    st.dataframe(pd.DataFrame([{'Teacher': t, 'Hours': v['hours'], 'Max/Day': v['max_daily_hours'], 'Idle': v['idle_hours'], 'Days': v['days']}
+                               for t, v in report['teachers'].items()]), use_container_width=True, hide_index=True)
+    if report['cohorts']:
+        st.markdown("**🎓 การกระจายของแต่ละหลักสูตร**")
+        st.dataframe(pd.DataFrame(report['cohorts']).T, use_container_width=True)
+    if report['unscheduled']:
+        st.markdown("**⛔ วิชาที่จัดไม่ได้**")
+        st.dataframe(pd.DataFrame(report['unscheduled']), use_container_width=True, hide_index=True)
+    st.download_button("📥 Download รายงาน (JSON)", to_json(report, indent=1).encode('utf-8'), "schedule_report.json", "application/json")
 
 # ==========================================
 # MAIN APP
@@ -502,23 +252,38 @@ def main():
         help="คะแนนลบที่จะหักเมื่อจัดคาบนอกเวลา 09:00-16:00 (ใช้ใน Flexible mode)"
     )
 
+    engine_sel = st.sidebar.radio(
+        "🧠 Engine:",
+        ["cpsat", "greedy"],
+        format_func=lambda x: "🧮 CP-SAT (เต็มรูปแบบ)" if x == "cpsat" else "⚡ Preview (Greedy)",
+        help="Preview = จัดตารางแบบ heuristic ได้ผลทันที (< 1 วินาที) ใช้ตอบคำถาม what-if\nCP-SAT = หาคำตอบที่ดีที่สุดภายในเวลาที่กำหนด"
+    )
+
     st.sidebar.divider()
     run_button = st.sidebar.button("🚀 คำนวณตารางเรียน", use_container_width=True)
 
     if run_button:
         mandatory = ['room', 'teacher_courses', 'ai_in', 'cy_in', 'all_teachers']
-        if any(up_files[k] is None for k in mandatory):
+        missing = any(up_files[k] is None for k in mandatory)
+        input_errors = [] if missing else validate_inputs(up_files)
+        if missing:
             st.error("❌ กรุณาอัปโหลดไฟล์บังคับ 5 ไฟล์แรกให้ครบถ้วน")
+        elif input_errors:
+            st.error("❌ ข้อมูลในไฟล์ไม่ถูกต้อง:\n\n" + "\n".join(f"- {e}" for e in input_errors[:20]))
         else:
             with st.status("🤖 กำลังประมวลผลตารางเรียน...", expanded=True) as status:
                 st.write("📊 กำลังโหลดข้อมูล...")
-                st.write("🧮 กำลังสร้างโมเดล CP-SAT...")
-                st.write(f"⚙️ ใช้เวลาสูงสุด {solver_time} วินาที")
-                
-                df_res = calculate_schedule(up_files, mode_sel, solver_time, penalty_val)
+                if engine_sel == "greedy":
+                    st.write("⚡ กำลังจัดตารางแบบ Preview...")
+                    df_res = calculate_schedule(up_files, mode_sel, solver_time, penalty_val, engine="greedy")
+                else:
+                    st.write("🧮 กำลังสร้างโมเดล CP-SAT...")
+                    st.write(f"⚙️ ใช้เวลาสูงสุด {solver_time} วินาที")
+                    df_res = calculate_schedule(up_files, mode_sel, solver_time, penalty_val)
                 
                 if df_res is not None and not df_res.empty:
                     st.session_state['res_df'] = df_res
+                    st.session_state['res_csv'] = None  # ผลลัพธ์ใหม่: encode ใหม่ตอนแสดงครั้งแรก
                     st.session_state['run_done'] = True
                     status.update(label="✅ คำนวณสำเร็จ!", state="complete")
                     st.balloons()
@@ -535,115 +300,14 @@ def main():
             <p>พบรายการทั้งหมด {len(df_res)} รายการ</p>
         </div>
         """, unsafe_allow_html=True)
+        if df_res.attrs.get('fixed_clashes'):
+            st.warning("⚠️ ตาราง Fixed ที่จองไม่ได้:\n\n" + "\n".join(f"- {e}" for e in df_res.attrs['fixed_clashes']))
         
-        col1, col2 = st.columns([2, 1])
-        with col1:
-            view_mode = st.radio(
-                "🔍 เลือกมุมมอง:",
-                ["👨‍🏫 รายอาจารย์ (Teacher View)", "🏫 รายห้อง (Room View)"],
-                horizontal=True
-            )
-        
-        if view_mode == "👨‍🏫 รายอาจารย์ (Teacher View)":
-            all_teachers = sorted(list(set([
-                i.strip() 
-                for s in df_res['Teacher'] 
-                for i in str(s).split(',') 
-                if i.strip() != '-' and i.strip() != 'Unknown'
-            ])))
-            
-            if not all_teachers:
-                st.warning("⚠️ ไม่พบข้อมูลอาจารย์ในตาราง")
-                return
-            
-            with col2:
-                target = st.selectbox("🔎 เลือกอาจารย์:", all_teachers)
-            
-            filt_df = df_res[df_res['Teacher'].str.contains(target, na=False)]
-            
-            if filt_df.empty:
-                st.info(f"ℹ️ ไม่พบตารางสอนสำหรับ {target}")
-                return
-            
-            st.markdown(f"""
-            <div class='info-box'>
-                <strong>📊 สถิติการสอน:</strong><br>
-                • จำนวนคาบสอนทั้งหมด: {len(filt_df)} คาบ<br>
-                • จำนวนวิชา: {filt_df['Course'].nunique()} วิชา
-            </div>
-            """, unsafe_allow_html=True)
-            
-        else:
-            with col2:
-                target = st.selectbox("🔎 เลือกห้อง:", sorted(df_res['Room'].unique()))
-            
-            filt_df = df_res[df_res['Room'] == target]
-            
-            if filt_df.empty:
-                st.info(f"ℹ️ ไม่พบตารางสำหรับห้อง {target}")
-                return
-
-        days_map = {
-            'Mon': 'จันทร์',
-            'Tue': 'อังคาร',
-            'Wed': 'พุธ',
-            'Thu': 'พฤหัสบดี',
-            'Fri': 'ศุกร์'
-        }
-        
-        time_headers = [f"{h:02d}:{m:02d}" for h in range(8, 20) for m in [0, 30]][1:]
-        
-        html = "<div class='tt-container'><table class='tt-table'>"
-        html += "<tr><th style='width: 100px;'>Day</th>"
-        for t in time_headers:
-            html += f"<th style='min-width: 70px;'>{t}</th>"
-        html += "</tr>"
-        
-        for day in ['Mon', 'Tue', 'Wed', 'Thu', 'Fri']:
-            html += f"<tr><td class='tt-day'>{days_map[day]}</td>"
-            d_data = filt_df[filt_df['Day'] == day]
-            curr = 8.5
-            
-            while curr < 19.0:
-                t_str = f"{int(curr):02d}:{round((curr % 1) * 60):02d}"
-                match = d_data[d_data['Start'] == t_str]
-                
-                if not match.empty:
-                    r = match.iloc[0]
-                    sh, sm = map(int, r['Start'].split(':'))
-                    eh, em = map(int, r['End'].split(':'))
-                    span = int(((eh + em/60) - (sh + sm/60)) * 2)
-                    
-                    html += f"<td colspan='{span}'><div class='class-box'>"
-                    html += f"<div class='c-code'>{r['Course']}</div>"
-                    html += f"<div>Section {r['Sec']} - {r['Type']}</div>"
-                    html += f"<div class='teacher-badge'>{r['Teacher']}</div>"
-                    html += f"<div style='font-size:10px;margin-top:2px;'>🏫 {r['Room']}</div>"
-                    if r['Note']:
-                        html += f"<div class='ext-time-badge'>{r['Note']}</div>"
-                    html += "</div></td>"
-                    curr += (span * 0.5)
-                else:
-                    html += "<td></td>"
-                    curr += 0.5
-            
-            html += "</tr>"
-        
-        html += "</table></div>"
-        
-        st.markdown(html, unsafe_allow_html=True)
-        
-        st.divider()
-        col1, col2, col3 = st.columns([1, 2, 1])
-        with col2:
-            csv_data = df_res.to_csv(index=False).encode('utf-8-sig')
-            st.download_button(
-                label="📥 Download ตารางเรียน (CSV)",
-                data=csv_data,
-                file_name=f"schedule_{target.replace(' ', '_')}.csv",
-                mime="text/csv",
-                use_container_width=True
-            )
+        tab_table, tab_stats = st.tabs(["🗓️ ตารางเรียน", "📊 Dashboard"])
+        with tab_table:
+            render_timetable(df_res)
+        with tab_stats:
+            render_dashboard(df_res)
 
 if 'run_done' not in st.session_state:
     st.session_state['run_done'] = False
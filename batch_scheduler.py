@@ -0,0 +1,142 @@
+"""Schedule several course sets (faculties, terms) that share rooms and teachers.
+
+    python batch_scheduler.py --job ai ai_in=ai_in_courses.csv ai_out=ai_out_courses.csv \\
+                              --job cy cy_in=cy_in_courses.csv cy_out=cy_out_courses.csv --out results
+
+Jobs are solved in rounds. In each round every pending job is solved in
+its own process against a snapshot of the reservation ledger. Results are
+then committed in job order: a job whose timetable does not overlap the
+ledger (including jobs committed earlier in the same round) is written to
+it. A job that does overlap waits for the next round and is solved again,
+this time seeing those reservations as fixed occupancy. The first pending
+job always commits, so there are at most as many rounds as jobs.
+
+A job whose solve returns no result (infeasible, solver or data error) is
+retried once in the next round; if it fails again it is reported as
+failed (``None``) and reserves nothing.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from result_writer import write_result
+from scheduler_engine import calculate_schedule
+from slot_calendar import compile_calendar
+from ui_assets import DEFAULT_FILES
+
+SHARED_KEYS = ['room', 'teacher_courses', 'all_teachers']
+MAX_ATTEMPTS = 2
+NOT_RESERVED = ('Online', 'Unknown', '-', '')
+
+# ==========================================
+# Reservation ledger
+# ==========================================
+def new_ledger():
+    return {'rooms': {}, 'teachers': {}}
+
+def result_occupancy(df, cal):
+    """[(kind, name, day, start slot, end slot)] for every room and teacher a result row uses."""
+    out = []
+    if df is None or df.empty: return out
+    for r in df.itertuples(index=False):
+        d, s, e = cal['days'].index(r.Day), cal['index'][r.Start], cal['index'][r.End]
+        if str(r.Room) not in NOT_RESERVED: out.append(('rooms', str(r.Room), d, s, e))
+        for tid in str(r.Teacher).split(','):
+            if tid.strip() not in NOT_RESERVED: out.append(('teachers', tid.strip(), d, s, e))
+    return out
+
+def ledger_conflicts(ledger, occupancy):
+    """Entries of ``occupancy`` that overlap something already in ``ledger``."""
+    return [o for o in occupancy if o[1] in ledger[o[0]] and ledger[o[0]][o[1]][o[2], o[3]:o[4]].any()]
+
+def ledger_add(ledger, occupancy, cal):
+    shape = (len(cal['days']), cal['n_slots'])
+    for kind, name, d, s, e in occupancy:
+        ledger[kind].setdefault(name, np.zeros(shape, dtype=bool))[d, s:e] = True
+
+# ==========================================
+# Batch run
+# ==========================================
+def _solve_job(files, mode, solver_time, penalty_score, engine, calendar, reserved):
+    return calculate_schedule(files, mode, solver_time, penalty_score, engine=engine, calendar=calendar, reserved=reserved)
+
+def schedule_batch(jobs, mode, solver_time, penalty_score, engine='two_phase', calendar=None,
+                   shared=None, workers=None, log=print):
+    """jobs: {name: files dict}; ``shared`` files (room, teacher_courses,
+    all_teachers) fill in whatever a job does not give itself.
+
+    Returns ({name: result DataFrame, or None if the job failed}, ledger).
+    When two jobs of a round want the same room or teacher, the one listed
+    first keeps it."""
+    cal = compile_calendar(calendar)
+    shared = shared or {k: DEFAULT_FILES[k] for k in SHARED_KEYS}
+    full = {name: {**shared, **files} for name, files in jobs.items()}
+    ledger, results, pending, rnd = new_ledger(), {}, list(jobs), 0
+    attempts = dict.fromkeys(jobs, 0)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        while pending:
+            rnd += 1
+            t0 = time.perf_counter()
+            futs = {name: pool.submit(_solve_job, full[name], mode, solver_time, penalty_score, engine, calendar, ledger)
+                    for name in pending}
+            solved, errors = {}, {}
+            for name, f in futs.items():
+                try:
+                    solved[name] = f.result()
+                except Exception as e:  # เช่น DatasetError: นับเป็นความพยายามที่ล้มเหลว ไม่ล้มทั้ง batch
+                    solved[name], errors[name] = None, e
+            retry = []
+            for name in pending:
+                if solved[name] is None:  # ไม่ใช่ตารางว่าง: solve ไม่สำเร็จ
+                    attempts[name] += 1
+                    if name in errors: log(f"[round {rnd}] {name}: {type(errors[name]).__name__}: {errors[name]}")
+                    if attempts[name] < MAX_ATTEMPTS:
+                        retry.append(name)
+                        log(f"[round {rnd}] {name}: จัดตารางไม่สำเร็จ จะลองใหม่รอบถัดไป")
+                    else:
+                        results[name] = None
+                        log(f"[round {rnd}] {name}: ล้มเหลว (ลอง {attempts[name]} ครั้ง)")
+                    continue
+                occ = result_occupancy(solved[name], cal)
+                clash = ledger_conflicts(ledger, occ)
+                if clash and name != pending[0]:  # งานแรกเห็น ledger ล่าสุดอยู่แล้ว
+                    retry.append(name)
+                    log(f"[round {rnd}] {name}: ชนกับงานก่อนหน้า {len(clash)} จุด จะจัดใหม่รอบถัดไป")
+                    continue
+                ledger_add(ledger, occ, cal)
+                results[name] = solved[name]
+                log(f"[round {rnd}] {name}: {len(solved[name])} รายการ")
+            log(f"[round {rnd}] {time.perf_counter() - t0:.1f}s")
+            pending = retry
+    return results, ledger
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--job', nargs='+', action='append', required=True, metavar='NAME KEY=PATH',
+                    help="job name followed by its files, e.g. --job ai ai_in=ai_in_courses.csv")
+    ap.add_argument('--mode', type=int, default=1, choices=[1, 2])
+    ap.add_argument('--time', type=float, default=30, help="solver time limit per job (s)")
+    ap.add_argument('--penalty', type=int, default=10)
+    ap.add_argument('--engine', default='two_phase')
+    ap.add_argument('--workers', type=int, default=None, help="processes (default: all cores)")
+    ap.add_argument('--out', default=None, help="directory for <job>.<format> results")
+    ap.add_argument('--format', default='csv', choices=['csv', 'jsonl', 'parquet'])
+    args = ap.parse_args()
+
+    jobs = {}
+    for name, *pairs in args.job:
+        jobs[name] = dict(p.split('=', 1) for p in pairs)
+    results, _ = schedule_batch(jobs, args.mode, args.time, args.penalty, args.engine, workers=args.workers)
+    failed = [name for name, df in results.items() if df is None]
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        for name, df in results.items():
+            if df is not None: write_result(df, os.path.join(args.out, f"{name}.{args.format}"))
+    if failed: sys.exit(f"จัดตารางไม่สำเร็จ: {', '.join(failed)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Benchmark the scheduler engines on the bundled CSV data.
+
+    python benchmark.py --engines joint two_phase lns --mode 1 --time 30
+    python benchmark.py --engines two_phase greedy --travel 0 15   # cost of building travel time
+    python benchmark.py --engines joint --budget 50 200            # top-K candidate pruning
+    python benchmark.py --build-workers 1 4 16                     # parallel model construction speed-up
+    python benchmark.py --imports                                  # cold import times vs. budget
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from scheduler_engine import ENGINES, build_candidates, build_model, build_problem, calculate_schedule, model_occupancy
+from slot_calendar import to_minutes
+from ui_assets import DEFAULT_FILES
+
+def building_moves(df, gap_minutes):
+    """Consecutive classes of one teacher on one day in different buildings, less than ``gap_minutes`` apart."""
+    building = dict(pd.read_csv(DEFAULT_FILES['room'], dtype=str)[['room', 'building']].apply(lambda c: c.str.strip()).values)
+    rows = [(tid.strip(), r.Day, to_minutes(r.Start), to_minutes(r.End), building.get(r.Room))
+            for r in df.itertuples() for tid in str(r.Teacher).split(',') if tid.strip() not in ('-', 'Unknown')]
+    rows.sort()
+    return sum(1 for a, b in zip(rows, rows[1:]) if a[:2] == b[:2] and a[4] and b[4] and a[4] != b[4] and b[2] - a[3] < max(gap_minutes, 1))
+
+def model_size(mode, penalty, calendar, travel):
+    """Joint model size with and without the travel constraints."""
+    t0 = time.perf_counter()
+    problem = build_problem(DEFAULT_FILES, mode, calendar)
+    if travel: problem['travel_slots'] = -(-travel // problem['cal']['slot_minutes'])
+    model, index = build_model(problem, build_candidates(problem), penalty)
+    return {'travel_min': travel, 'variables': len(model.Proto().variables),
+            'constraints': len(model.Proto().constraints), 'build_s': round(time.perf_counter() - t0, 2)}
+
+def build_speedup(mode, penalty, calendar, workers):
+    """Joint-model build time per process count, and the speed-up over the first count."""
+    problem = build_problem(DEFAULT_FILES, mode, calendar)
+    cands = build_candidates(problem)
+    rows = []
+    for w in workers:
+        t0 = time.perf_counter()
+        model_occupancy(problem, cands, w)
+        t1 = time.perf_counter()
+        build_model(problem, cands, penalty, workers=w)
+        t2 = time.perf_counter()
+        rows.append({'workers': w, 'occupancy_s': round(t1 - t0, 3), 'build_s': round(t2 - t1, 2)})
+    for r in rows: r['speedup'] = f"{rows[0]['build_s'] / max(r['build_s'], 1e-9):.2f}x"
+    return rows
+
+def run_engine(engine, mode, solver_time, penalty, warm_start=False, calendar=None, dump_path=None, travel=0, gap=0, budget=None):
+    trace = []
+    t0 = time.perf_counter()
+    df = calculate_schedule(DEFAULT_FILES, mode, solver_time, penalty, engine=engine, progress=trace.append,
+                            warm_start=warm_start, calendar=calendar, dump_path=dump_path, travel_minutes=travel,
+                            candidate_budget=budget)
+    wall = time.perf_counter() - t0
+    row = {'engine': engine, 'travel_min': travel, 'wall_s': round(wall, 2),
+           'first_s': round(trace[0]['wall_time'], 2) if trace else '-',
+           'objective': round(trace[-1]['objective']) if trace else '-', 'rows': 0, 'ext_time': 0, 'moves': 0}
+    if df is not None and not df.empty:
+        row.update(rows=len(df), ext_time=int((df['Note'] == 'Ext.Time').sum()), moves=building_moves(df, gap))
+    if budget:
+        cb = (df.attrs.get('candidate_budget') if df is not None else None) or {}
+        row.update(k=cb.get('k', '-'), rounds=cb.get('rounds', '-'), literals=f"{cb.get('literals', '-')}/{cb.get('literals_full', '-')}")
+    return row
+
+# ==========================================
+# Import-time budget
+# ==========================================
+# หน้าแอปต้องโหลดได้โดยไม่แตะ OR-Tools; ms ที่ยอมให้ import ครั้งแรก (รวม streamlit/pandas)
+UI_MODULES = ['ui_assets', 'app', 'wub_app']
+IMPORT_TARGETS = UI_MODULES + ['scheduler_engine']
+IMPORT_BUDGET_MS = 1500
+
+def import_time(module):
+    """Cold import of ``module`` in a fresh interpreter: (ms from ``python -X importtime``, OR-Tools loaded?)."""
+    r = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import sys, {module}; print('ortools' in sys.modules)"],
+                       capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if r.returncode != 0: raise RuntimeError(f"import {module} ไม่สำเร็จ:\n{r.stderr[-2000:]}")
+    # บรรทัด "import time: self | cumulative | name" ที่ไม่ย่อหน้า = import ระดับบนสุด รวมกันได้เวลาทั้งหมด
+    total = sum(int(line.split('|')[1]) for line in r.stderr.splitlines()
+                if line.startswith('import time:') and '|' in line and not line.split('|')[2].startswith('  ')
+                and line.split('|')[1].strip().isdigit())
+    return total / 1000, r.stdout.strip().endswith('True')
+
+def import_report(budget_ms=IMPORT_BUDGET_MS):
+    """(rows, ok): UI modules must stay within ``budget_ms`` and must not load OR-Tools."""
+    rows, ok = [], True
+    for m in IMPORT_TARGETS:
+        ms, ortools = import_time(m)
+        within = m not in UI_MODULES or (ms <= budget_ms and not ortools)
+        ok &= within
+        rows.append({'module': m, 'import_ms': round(ms), 'ortools': ortools,
+                     'budget': '-' if m not in UI_MODULES else ('ok' if within else 'OVER')})
+    return rows, ok
+
+def print_table(rows):
+    cols = list(rows[0])
+    width = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in cols}
+    print("  ".join(c.ljust(width[c]) for c in cols))
+    for r in rows: print("  ".join(str(r[c]).ljust(width[c]) for c in cols))
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--engines', nargs='+', default=ENGINES, choices=ENGINES)
+    ap.add_argument('--mode', type=int, default=1, choices=[1, 2])
+    ap.add_argument('--time', type=float, default=30, help="solver time limit per engine (s)")
+    ap.add_argument('--penalty', type=int, default=10)
+    ap.add_argument('--warm-start', action='store_true', help="hint the joint model with the greedy timetable")
+    ap.add_argument('--slot-minutes', type=int, default=30, help="time grid resolution")
+    ap.add_argument('--dump', help="also save the joint model here for replay.py")
+    ap.add_argument('--travel', type=int, nargs='+', default=[0],
+                    help="minutes between a teacher's classes in different buildings (one run per value)")
+    ap.add_argument('--budget', type=int, nargs='+', default=[None],
+                    help="candidate budget K per task (one run per value; widened x2 if mandatory tasks are lost)")
+    ap.add_argument('--build-workers', type=int, nargs='+',
+                    help="only time joint-model construction with these process counts, e.g. 1 4 16")
+    ap.add_argument('--imports', action='store_true', help="only measure cold import times against the budget")
+    ap.add_argument('--import-budget', type=float, default=IMPORT_BUDGET_MS, help="ms allowed for each UI module")
+    args = ap.parse_args()
+    if args.imports:
+        rows, ok = import_report(args.import_budget)
+        print_table(rows)
+        sys.exit(0 if ok else 1)
+    calendar = {'slot_minutes': args.slot_minutes}
+    if args.build_workers:
+        print_table(build_speedup(args.mode, args.penalty, calendar, args.build_workers))
+        return
+    gap = max(args.travel)  # moves = ย้ายตึกโดยมีเวลาน้อยกว่านี้
+    if gap:
+        print_table([model_size(args.mode, args.penalty, calendar, tr) for tr in args.travel])
+        print()
+    print_table([run_engine(e, args.mode, args.time, args.penalty, args.warm_start, calendar,
+                            args.dump if i == 0 and j == 0 else None, tr, gap, k)
+                 for k in args.budget for j, tr in enumerate(args.travel) for i, e in enumerate(args.engines)])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Multi-resolution solve: day/block assignment on a coarse grid, then the fine grid.
+
+The coarse problem has the same tasks, rooms and days but slots of
+``block_minutes`` (90 = one typical lecture part), so it has a fraction of
+the placement literals. Its solution restricts every task of the fine
+model to the same day and to starts within ``radius`` minutes of the coarse
+start, and is passed to CP-SAT as a hint.
+"""
+import time
+
+from ortools.sat.python import cp_model
+
+from scheduler_engine import build_candidates, build_model, solve_model
+from slot_calendar import compile_calendar
+
+COARSE_MINUTES = 90
+
+def coarsen_problem(problem, block_minutes=COARSE_MINUTES):
+    """Same tasks on a ``block_minutes`` grid.
+
+    A coarse slot is unavailable to a teacher (or a reserved room) if any
+    fine slot it overlaps is. The coarse model always runs in mode 2 so
+    that a block which only partly leaves the core window is still usable;
+    the fine model enforces the real mode."""
+    fine = problem['cal']
+    cal = compile_calendar({**fine['config'], 'slot_minutes': block_minutes})
+    f0, f1 = fine['minutes'][:-1], fine['minutes'][1:]
+    c0, c1 = cal['minutes'][:-1], cal['minutes'][1:]
+    overlap = ((f0[:, None] < c1[None, :]) & (f1[:, None] > c0[None, :])).astype(int)  # fine x coarse
+
+    coarse = lambda m: (m.astype(int) @ overlap) > 0
+    un_map = {tid: coarse(m) for tid, m in problem['un_map'].items()}
+    room_blocked = {c: coarse(m) for c, m in problem['room_blocked'].items()}
+
+    step = fine['slot_minutes']
+    tasks = [dict(t, dur=-(-t['dur'] * step // block_minutes)) for t in problem['tasks']]
+    travel = -(-problem.get('travel_slots', 0) * step // block_minutes)
+    return {**problem, 'cal': cal, 'mode': 2, 'un_map': un_map, 'room_blocked': room_blocked, 'tasks': tasks,
+            'travel_slots': travel}
+
+def restrict_candidates(problem, cands, coarse_cal, coarse_placed, radius):
+    """Keep fine candidates on the coarse day within ``radius`` minutes of the coarse start.
+
+    Tasks the coarse stage did not place (or whose window is empty) keep
+    their full domain. Returns (restricted candidates, hint placement)."""
+    minutes = problem['cal']['minutes']
+    out, hint = {}, {}
+    for uid, items in cands.items():
+        if uid not in coarse_placed:
+            out[uid] = items; continue
+        cc, cd, cs = coarse_placed[uid]
+        target = int(coarse_cal['minutes'][cs])
+        near = [(c, d, s) for (c, d, s) in items if d == cd and abs(int(minutes[s]) - target) <= radius]
+        out[uid] = near or items
+        if near:
+            hint[uid] = min(near, key=lambda k: (k[0] != cc, abs(int(minutes[k[2]]) - target)))
+    return out, hint
+
+def solve_coarse_to_fine(problem, solver_time, penalty_score, block_minutes=COARSE_MINUTES,
+                         coarse_share=0.3, radius=None, progress=None):
+    """Solve the coarse grid with the two-phase engine, then the restricted fine joint model.
+
+    Returns uid -> (class, day, start) on the fine grid, or None."""
+    from two_phase_engine import solve_two_phase
+    t0 = time.perf_counter()
+    radius = block_minutes if radius is None else radius
+    coarse = coarsen_problem(problem, block_minutes)
+    coarse_pen = penalty_score if problem['mode'] == 2 else 10  # mode 1: แค่ให้เลี่ยงขอบช่วง core
+    coarse_placed = solve_two_phase(coarse, max(1.0, solver_time * coarse_share), coarse_pen) or {}
+
+    cands, hint = restrict_candidates(problem, build_candidates(problem), coarse['cal'], coarse_placed, radius)
+    model, index = build_model(problem, cands, penalty_score)
+    for (uid, c, d, s), v in index['x'].items():
+        if uid in hint: model.AddHint(v, int(hint[uid] == (c, d, s)))
+    for uid, v in index['is_sched'].items(): model.AddHint(v, int(uid in hint))
+
+    offset = time.perf_counter() - t0
+    shifted = (lambda p: progress({**p, 'wall_time': offset + p['wall_time']})) if progress else None
+    solver, status = solve_model(model, max(1.0, solver_time - offset), shifted)
+    if status in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
+        return {k[0]: k[1:] for k, v in index['x'].items() if solver.Value(v)}
+    return None
@@ -1,22 +1,24 @@
-import pandas as pd
+from dataset_cache import load_datasets
 
 def load_all_data():
-    df_room = pd.read_csv("room.csv")
-    df_teacher = pd.read_csv("all_teachers.csv")
-    df_teacher_courses = pd.read_csv("teacher_courses.csv")
-    df_ai_in = pd.read_csv("ai_in_courses.csv")
-    df_ai_out = pd.read_csv("ai_out_courses.csv")
-    df_cy_in = pd.read_csv("cy_in_courses.csv")
-    df_cy_out = pd.read_csv("cy_out_courses.csv")
-    students = pd.read_csv("students.csv")
+    data = load_datasets({
+        "room": "room.csv",
+        "all_teachers": "all_teachers.csv",
+        "teacher_courses": "teacher_courses.csv",
+        "ai_in": "ai_in_courses.csv",
+        "ai_out": "ai_out_courses.csv",
+        "cy_in": "cy_in_courses.csv",
+        "cy_out": "cy_out_courses.csv",
+        "students": "students.csv",
+    })
 
     return {
-        "room": df_room,
-        "teacher": df_teacher,
-        "teacher_courses": df_teacher_courses,
-        "ai_in": df_ai_in,
-        "ai_out": df_ai_out,
-        "cy_in": df_cy_in,
-        "cy_out": df_cy_out,
-        "students": students,
+        "room": data["room"],
+        "teacher": data["all_teachers"],
+        "teacher_courses": data["teacher_courses"],
+        "ai_in": data["ai_in"],
+        "ai_out": data["ai_out"],
+        "cy_in": data["cy_in"],
+        "cy_out": data["cy_out"],
+        "students": data["students"],
     }
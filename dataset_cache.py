@@ -0,0 +1,181 @@
+"""Validated, columnar snapshots of the input CSV files.
+
+Each dataset is read from CSV once, checked against ``SCHEMAS`` (column
+presence, types, day/start strings) and written as a Feather file under
+``CACHE_DIR``. Later loads memory-map the snapshot as long as the source
+file is unchanged. Without pyarrow the data is still validated, just not
+cached.
+"""
+import hashlib
+import os
+import re
+
+import pandas as pd
+
+try:
+    from pyarrow import feather
+except ImportError:  # optional: validate only, no snapshot
+    feather = None
+
+CACHE_DIR = '.schedule_cache'
+SCHEMA_VERSION = 1
+DAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+class DatasetError(ValueError):
+    """Raised when input files do not match their schema; ``errors`` holds one line per bad cell."""
+    def __init__(self, errors):
+        self.errors = errors
+        more = f"\n... และอีก {len(errors) - 20} รายการ" if len(errors) > 20 else ""
+        super().__init__("\n".join(errors[:20]) + more)
+
+    def __reduce__(self):  # ส่งข้าม process (batch) ได้โดยไม่เสีย ``errors``
+        return DatasetError, (self.errors,)
+
+COLUMN_DTYPES = {'str': 'string', 'code': 'string', 'day': 'string', 'time': 'string',
+                 'int': 'int64', 'flag': 'int64', 'float': 'float64', 'hours': 'float64'}
+
+# column -> (kind, required)
+COURSE_COLUMNS = {
+    'course_code': ('code', True), 'course_name': ('str', False), 'credit': ('float', False),
+    'lecture_hour': ('hours', True), 'lab_hour': ('hours', True), 'section': ('int', True),
+    'enrollment_count': ('int', True), 'optional': ('flag', False), 'require_lab_ai': ('flag', False),
+    'require_lab_network': ('flag', False), 'lec_online': ('flag', False), 'lab_online': ('flag', False),
+}
+FIXED_COLUMNS = {
+    'course_code': ('code', True), 'course_name': ('str', False), 'credit': ('float', False),
+    'lecture_hour': ('hours', True), 'lab_hour': ('hours', True), 'section': ('int', True),
+    'enrollment_count': ('int', False), 'day': ('day', True), 'start': ('time', True), 'room': ('code', True),
+}
+SCHEMAS = {
+    'room': {'room': ('code', True), 'capacity': ('int', True), 'type': ('str', True), 'building': ('str', False)},
+    'teacher_courses': {'teacher_id': ('code', True), 'course_code': ('code', True)},
+    'all_teachers': {'teacher_id': ('code', True), 'unavailable_times': ('str', False), 'max_hours_per_day': ('float', False)},
+    'ai_in': COURSE_COLUMNS, 'cy_in': COURSE_COLUMNS,
+    'ai_out': FIXED_COLUMNS, 'cy_out': FIXED_COLUMNS,
+    'students': {'Student Group': ('code', True), 'Number of Students': ('int', True)},
+}
+
+# ==========================================
+# Validation
+# ==========================================
+def _check_cell(kind, val):
+    """(normalized value, error message or None)"""
+    if kind in ('str', 'code'):
+        if pd.isna(val): return (None, "ต้องไม่เป็นค่าว่าง") if kind == 'code' else ('', None)
+        s = str(val).strip()
+        return (s, None) if s or kind == 'str' else (None, "ต้องไม่เป็นค่าว่าง")
+    if kind == 'day':
+        s = str(val).strip()[:3].title()
+        return (s, None) if s in DAY_NAMES else (None, f"วันไม่ถูกต้อง '{val}' (ต้องเป็น {'/'.join(DAY_NAMES)})")
+    if kind == 'time':
+        m = re.fullmatch(r"(\d{1,2})[:.](\d{2})", str(val).strip())
+        if not m or int(m.group(1)) > 23 or int(m.group(2)) > 59: return None, f"เวลาไม่ถูกต้อง '{val}' (ต้องเป็น HH:MM)"
+        return f"{int(m.group(1)):02d}:{m.group(2)}", None
+    if pd.isna(val): return (0, None)
+    try:
+        f = float(val)
+    except (TypeError, ValueError):
+        return None, f"ต้องเป็นตัวเลข แต่ได้ '{val}'"
+    if kind == 'int':
+        if f != int(f) or f < 0: return None, f"ต้องเป็นจำนวนเต็มไม่ติดลบ แต่ได้ '{val}'"
+        return int(f), None
+    if kind == 'flag':
+        return (int(f), None) if f in (0, 1) else (None, f"ต้องเป็น 0 หรือ 1 แต่ได้ '{val}'")
+    if kind == 'hours':  # 0.25 ชม. = grid 15 นาที; grid หยาบกว่านั้นปัดขึ้นใน duration_slots
+        return (f, None) if f >= 0 and (f * 4) == int(f * 4) else (None, f"ชั่วโมงต้องเป็นทวีคูณของ 0.25 แต่ได้ '{val}'")
+    return f, None
+
+def validate_table(key, df, source=None):
+    """Check ``df`` against ``SCHEMAS[key]``; returns (normalized DataFrame, list of error lines)."""
+    schema, name = SCHEMAS.get(key, {}), source or key
+    df = df.rename(columns=lambda c: str(c).strip())
+    errors = [f"{name}: ไม่มีคอลัมน์ '{c}'" for c, (_, req) in schema.items() if req and c not in df.columns]
+    if errors: return df, errors
+    out = df.copy()
+    for col, (kind, _) in schema.items():
+        if col not in df.columns: continue
+        vals, n_err = [], len(errors)
+        for i, v in enumerate(df[col].tolist()):
+            nv, err = _check_cell(kind, v)
+            if err: errors.append(f"{name} แถว {i + 2}, คอลัมน์ '{col}': {err}")  # +2 = header + 1-based
+            vals.append(nv)
+        if len(errors) == n_err:
+            out[col] = pd.Series(vals, index=df.index, dtype=COLUMN_DTYPES[kind])
+    return out, errors
+
+# ==========================================
+# Snapshots
+# ==========================================
+def _source_fingerprint(src):
+    """Identity of a CSV source for freshness checks, or None when it cannot be cached."""
+    if isinstance(src, (str, os.PathLike)):
+        st_ = os.stat(src)
+        raw = f"{os.path.abspath(src)}|{st_.st_mtime_ns}|{st_.st_size}".encode()
+    elif hasattr(src, 'getvalue'):
+        raw = src.getvalue()
+        if not isinstance(raw, bytes): raw = str(raw).encode()
+    else:
+        return None
+    return hashlib.sha1(raw + f"|v{SCHEMA_VERSION}".encode()).hexdigest()[:16]
+
+def _source_name(src):
+    return os.path.basename(src) if isinstance(src, (str, os.PathLike)) else getattr(src, 'name', None)
+
+def _read_snapshot(path):
+    """DataFrame from a Feather snapshot, or None if it is missing / unreadable (evicted, partial)."""
+    try:
+        return feather.read_table(path, memory_map=True).to_pandas()
+    except (OSError, ValueError):  # FileNotFoundError, ArrowInvalid ฯลฯ -> อ่าน CSV ใหม่
+        return None
+
+def _write_snapshot(df, path, key):
+    """Write to a temp file in the same directory and ``os.replace`` it into place.
+
+    Readers only ever see a complete file. Older snapshots of ``key`` are
+    evicted afterwards, never the one just written."""
+    cache_dir = os.path.dirname(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        feather.write_feather(df.reset_index(drop=True), tmp)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp): os.remove(tmp)
+        return
+    current = os.path.basename(path)
+    for old in os.listdir(cache_dir):
+        if old != current and old.startswith(f"{key}-") and old.endswith('.feather'):
+            try:
+                os.remove(os.path.join(cache_dir, old))
+            except OSError:  # อีก process ลบไปแล้ว
+                pass
+
+def load_table(key, src, cache_dir=CACHE_DIR):
+    """Load one dataset: snapshot if fresh, else CSV -> validate -> snapshot."""
+    if isinstance(src, pd.DataFrame):
+        df, errors = validate_table(key, src)
+        if errors: raise DatasetError(errors)
+        return df
+    fp = _source_fingerprint(src) if feather is not None else None
+    path = os.path.join(cache_dir, f"{key}-{fp}.feather") if fp else None
+    if path:
+        df = _read_snapshot(path)
+        if df is not None: return df
+
+    if hasattr(src, 'seek'): src.seek(0)
+    df, errors = validate_table(key, pd.read_csv(src), _source_name(src))
+    if errors: raise DatasetError(errors)
+    if path: _write_snapshot(df, path, key)
+    return df
+
+def load_datasets(files, cache_dir=CACHE_DIR):
+    """Validate and load every non-empty entry of ``files``; all schema errors are reported together."""
+    out, errors = {}, []
+    for key, src in files.items():
+        if src is None: continue
+        try:
+            out[key] = load_table(key, src, cache_dir)
+        except DatasetError as e:
+            errors.extend(e.errors)
+    if errors: raise DatasetError(errors)
+    return out
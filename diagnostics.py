@@ -0,0 +1,181 @@
+"""Why was a task left out? One reason per unscheduled task.
+
+Checks run from cheapest to most expensive and stop at the first that
+explains the task:
+
+    no_room           no room class has the features / capacity it needs
+    too_long          no window of that length exists in the (mode) calendar
+    teacher_busy      windows exist, but a teacher is unavailable in all of them
+    room_reserved     every remaining start hits a reserved (fixed / batch) room
+    part_link         free placements exist, but each breaks a rule between the
+                      parts of its lecture (distinct days, ``part_link`` start / room)
+    travel_time       free placements exist, but each leaves a teacher too
+                      little time to change buildings (``travel_slots``)
+    pruned            a placement is still free, but the candidate budget
+                      (``candidate_budget``) dropped it before solving
+    free_slot         a candidate is still free in the final timetable; the
+                      solver ran out of time or the Ext.Time penalty outweighs it
+    competing_tasks   every candidate is taken by placed tasks; a small CP-SAT
+                      model with one assumption literal per placed task gives a
+                      subset of them that blocks the task on its own
+
+``explain_unscheduled`` runs automatically from ``build_result``. All the
+core models of one call share ``core_budget`` seconds; past it (or with
+``core_budget=0``, as for greedy previews) ``Blockers`` stays empty.
+"""
+import time
+from collections import defaultdict
+
+from ortools.sat.python import cp_model
+
+from scheduler_engine import add_cliques, build_candidates, class_buildings, eligible_classes, feasible_starts, window_ok
+
+CORE_BUDGET = 1.0 # วินาทีรวมของ blocking_core ทั้งหมดต่อหนึ่งผลลัพธ์
+
+REASONS = {
+    'no_room': 'ไม่มีห้องที่รองรับ (ประเภท/ความจุ)',
+    'too_long': 'ไม่มีช่วงเวลาในตารางที่ยาวพอ',
+    'teacher_busy': 'อาจารย์ไม่ว่างในทุกช่วงที่ยาวพอ',
+    'room_reserved': 'ห้องที่รองรับถูกจองไว้แล้ว (Fixed/batch) ในทุกช่วงที่ว่าง',
+    'pruned': 'ช่วงที่ยังว่างถูกตัดออกโดย candidate budget (เพิ่ม K)',
+    'part_link': 'ช่วงที่ว่างผิดเงื่อนไขของส่วนบรรยาย (คนละวัน / เวลาเริ่มหรือห้องเดียวกัน)',
+    'travel_time': 'ช่วงที่ว่างทำให้อาจารย์มีเวลาเดินทางข้ามอาคารไม่พอ',
+    'free_slot': 'ยังมีช่วงว่าง แต่ solver ไม่เลือก (หมดเวลาหรือ penalty Ext.Time สูงกว่าน้ำหนักวิชา)',
+    'competing_tasks': 'ทุกช่วงที่เป็นไปได้ถูกวิชาอื่นใช้',
+}
+
+def final_occupancy(problem, placed):
+    """(class, day, slot) -> [uid], (teacher, day, slot) -> [uid] of the placed tasks."""
+    task_of = {t['uid']: t for t in problem['tasks']}
+    by_class, by_teacher = defaultdict(list), defaultdict(list)
+    for uid, (c, d, s) in placed.items():
+        if uid not in task_of: continue
+        for i in range(s, s + task_of[uid]['dur']):
+            by_class[(c, d, i)].append(uid)
+            for tid in task_of[uid]['tea']: by_teacher[(tid, d, i)].append(uid)
+    return by_class, by_teacher
+
+def is_free(problem, t, key, by_class, by_teacher):
+    """True if placement ``key`` = (class, day, start) of ``t`` is still open in the final occupancy."""
+    c, d, s = key
+    rng, rooms = range(s, s + t['dur']), len(problem['classes'][c]['rooms'])
+    return (all(len(by_class.get((c, d, i), [])) < rooms for i in rng) and
+            not any(by_teacher.get((tid, d, i)) for tid in t['tea'] for i in rng))
+
+def link_ok(problem, t, key, placed):
+    """True if ``key`` keeps t's placed sibling parts on other days (and the ``part_link`` start / room class)."""
+    c, d, s = key
+    link = problem.get('part_link')
+    for uids in problem.get('part_groups', {}).values():
+        if t['uid'] not in uids: continue
+        for c2, d2, s2 in (placed[u] for u in uids if u != t['uid'] and u in placed):
+            if d2 == d or (link == 'start' and s2 != s) or (link == 'room' and c2 != c): return False
+    return True
+
+def teacher_buildings(problem, placed):
+    """(teacher, day, slot) -> buildings of the placed tasks; empty without ``travel_slots``."""
+    out = defaultdict(set)
+    if not problem.get('travel_slots'): return out
+    task_of, bld = {t['uid']: t for t in problem['tasks']}, class_buildings(problem['classes'])
+    for uid, (c, d, s) in placed.items():
+        if uid not in task_of or c not in bld: continue
+        for i in range(s, s + task_of[uid]['dur']):
+            for tid in task_of[uid]['tea']: out[(tid, d, i)].add(bld[c])
+    return out
+
+def travel_ok(problem, t, key, tea_bld, bld):
+    """True if no teacher of ``t`` is in another building within ``travel_slots`` of placement ``key``.
+
+    ``bld`` is ``class_buildings(problem['classes'])``."""
+    c, d, s = key
+    travel = problem.get('travel_slots', 0)
+    if not travel or c not in bld: return True
+    return not any(b != bld[c] for tid in t['tea'] for i in range(s - travel, s + t['dur'] + travel)
+                   for b in tea_bld.get((tid, d, i), ()))
+
+def pruned_losses(problem, placed, full, kept):
+    """Mandatory tasks left out although a placement the candidate budget dropped is still free."""
+    by_class, by_teacher = final_occupancy(problem, placed)
+    tea_bld, bld = teacher_buildings(problem, placed), class_buildings(problem['classes'])
+    return [t['uid'] for t in problem['tasks'] if t.get('opt') == 0 and t['uid'] not in placed and
+            any(is_free(problem, t, k, by_class, by_teacher) and link_ok(problem, t, k, placed) and travel_ok(problem, t, k, tea_bld, bld)
+                for k in set(full[t['uid']]) - set(kept[t['uid']]))]
+
+def blocking_core(problem, t, cands, placed, by_class, by_teacher, time_limit=1.0):
+    """Placed tasks that together leave no candidate for ``t``.
+
+    Sub-model: exactly one of t's candidates, plus a literal a_k per placed
+    task that competes for the same class or teacher slots. Room-class
+    capacity and teacher constraints are restricted to those slots. Solving
+    under the assumptions a_k = 1 is infeasible, and the core names the
+    tasks that matter."""
+    classes = problem['classes']
+    model = cp_model.CpModel()
+    pick = [model.NewBoolVar(f"p_{c}_{d}_{s}") for c, d, s in cands]
+    model.AddExactlyOne(pick)
+    a, cls_use, tea_use = {}, defaultdict(list), defaultdict(list)
+    for v, (c, d, s) in zip(pick, cands):
+        for i in range(s, s + t['dur']):
+            cls_use[(c, d, i)].append(v)
+            for tid in t['tea']: tea_use[(tid, d, i)].append(v)
+    for key in list(cls_use):
+        for uid in by_class.get(key, []):
+            if uid not in a: a[uid] = model.NewBoolVar(f"a_{uid}")
+    for key in list(tea_use):
+        for uid in by_teacher.get(key, []):
+            if uid not in a: a[uid] = model.NewBoolVar(f"a_{uid}")
+    add_cliques(model, [(lits + [a[u] for u in by_class.get((c, d, i), [])], len(classes[c]['rooms'])) for (c, d, i), lits in cls_use.items()] +
+                       [(lits + [a[u] for u in by_teacher.get(key, [])], 1) for key, lits in tea_use.items()])
+    model.AddAssumptions(list(a.values()))
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.num_workers = 1  # core ต้องใช้ worker เดียว
+    if solver.Solve(model) != cp_model.INFEASIBLE: return sorted(a)
+    by_index = {v.Index(): uid for uid, v in a.items()}
+    return sorted(by_index[i] for i in solver.SufficientAssumptionsForInfeasibility() if i in by_index)
+
+def explain_unscheduled(problem, placed, cands=None, core_time=1.0, core_budget=CORE_BUDGET):
+    """[{'Course', 'Sec', 'Type', 'Hours', 'Teacher', 'Optional', 'Code', 'Reason', 'Blockers'}] for tasks not in ``placed``."""
+    missing = [t for t in problem['tasks'] if t['uid'] not in placed]
+    if not missing: return []
+    # ตัวเลือกทั้งหมด (ไม่ตัดด้วย budget) เพื่อแยกกรณี "ถูกตัดทิ้ง" ออกจาก "ถูกใช้หมด"
+    kept = build_candidates(problem) if cands is None else cands
+    cands = build_candidates({**problem, 'candidate_budget': None}) if problem.get('candidate_budget') else kept
+    cal, classes, n_days = problem['cal'], problem['classes'], len(problem['days'])
+    by_class, by_teacher = final_occupancy(problem, placed)
+    tea_bld, bld = teacher_buildings(problem, placed), class_buildings(classes)
+    deadline = time.perf_counter() + core_budget
+    task_of = {t['uid']: t for t in problem['tasks']}
+    window = cal['open'] & (cal['core'] if problem['mode'] == 1 else True)
+    out, core_cache = [], {}  # sec ที่อาจารย์/ความยาว/ตัวเลือกเหมือนกันได้ core เดียวกัน
+    for t in missing:
+        blockers = []
+        if not eligible_classes(t, classes):
+            code = 'no_room'
+        elif not window_ok(window, t['dur']).any():
+            code = 'too_long'
+        elif not any(feasible_starts(t, d, problem) for d in range(n_days)):
+            code = 'teacher_busy'
+        elif not cands[t['uid']]:
+            code = 'room_reserved'
+        else:
+            free_at = [k for k in cands[t['uid']] if is_free(problem, t, k, by_class, by_teacher)]
+            linked = [k for k in free_at if link_ok(problem, t, k, placed)]
+            reachable = [k for k in linked if travel_ok(problem, t, k, tea_bld, bld)]
+            if reachable:
+                code = 'free_slot' if set(reachable) & set(kept[t['uid']]) else 'pruned'
+            elif linked:
+                code = 'travel_time'
+            elif free_at:
+                code = 'part_link'
+            else:
+                code = 'competing_tasks'
+                key = (tuple(t['tea']), t['dur'], tuple(cands[t['uid']]))
+                left = deadline - time.perf_counter()
+                if key not in core_cache and left > 0:
+                    core_cache[key] = blocking_core(problem, t, cands[t['uid']], placed, by_class, by_teacher, min(core_time, left))
+                blockers = [f"{task_of[u]['id']} sec {task_of[u]['sec']} {task_of[u]['type']}" for u in core_cache.get(key, [])]
+        out.append({'Course': t['id'], 'Sec': t['sec'], 'Type': t['type'], 'Hours': t['dur'] * cal['slot_minutes'] / 60,
+                    'Teacher': ",".join(t['tea']), 'Optional': bool(t.get('opt')), 'Code': code,
+                    'Reason': REASONS[code], 'Blockers': ", ".join(blockers)})
+    return out
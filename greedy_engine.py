@@ -0,0 +1,59 @@
+from collections import defaultdict
+
+from scheduler_engine import build_candidates, class_buildings, is_ext_time, part_rank, task_weight
+
+def task_order(problem, cands):
+    """Mandatory (optional == 0) > optional; inside a level, fewest candidates and longest first."""
+    return sorted(problem['tasks'],
+                  key=lambda t: (-task_weight(t), len(cands[t['uid']]), -t['dur']))
+
+def solve_greedy(problem, cands=None):
+    """Place tasks one by one into the first free candidate; returns uid -> (class, day, start).
+
+    Candidates come from ``build_candidates`` so mode, lunch, teacher
+    availability and room eligibility are exactly the ones CP-SAT sees.
+    In-window slots are preferred over Ext.Time, then the least loaded day.
+    With ``problem['travel_slots']`` a teacher's classes in different
+    buildings keep that many slots apart. Parts of one lecture section get
+    distinct days (and the ``part_link`` start/room class)."""
+    cands = build_candidates(problem) if cands is None else cands
+    classes, cal = problem['classes'], problem['cal']
+    travel = problem.get('travel_slots', 0)
+    bld = class_buildings(classes) if travel else {}
+    room_used = defaultdict(int)  # (class, day, slot) -> rooms taken
+    tea_busy = set()              # (teacher, day, slot)
+    tea_at = {}                   # (teacher, day, slot) -> building
+    day_load = defaultdict(int)
+    placed = {}
+    group_of = {u: g for g, uids in problem.get('part_groups', {}).items() for u in uids}
+    link = problem.get('part_link')
+
+    for t in task_order(problem, cands):
+        dur, tea = t['dur'], t['tea']
+        best = None
+        for (c, d, s) in cands[t['uid']]:
+            cap = len(classes[c]['rooms'])
+            if any(room_used[(c, d, s+i)] >= cap for i in range(dur)): continue
+            if any((tid, d, s+i) in tea_busy for tid in tea for i in range(dur)): continue
+            if c in bld and any(tea_at.get((tid, d, i), bld[c]) != bld[c] for tid in tea
+                                for i in list(range(s - travel, s)) + list(range(s + dur, s + dur + travel))): continue
+            sibs = [placed[u] for u in problem['part_groups'][group_of[t['uid']]] if u in placed] if t['uid'] in group_of else []
+            if any(d == sd or (link == 'start' and s != ss) or (link == 'room' and c != sc) for sc, sd, ss in sibs): continue
+            key = (is_ext_time(cal, s, dur), day_load[d], s)
+            if best is None or key < best[0]: best = (key, (c, d, s))
+        if best is None: continue
+        c, d, s = best[1]
+        placed[t['uid']] = (c, d, s)
+        day_load[d] += dur
+        for i in range(dur):
+            room_used[(c, d, s+i)] += 1
+            for tid in tea:
+                tea_busy.add((tid, d, s+i))
+                if c in bld: tea_at[(tid, d, s+i)] = bld[c]
+    # ส่วนที่ยาวเท่ากันสลับกันได้: เรียงตามวันให้ตรงกับเงื่อนไขของโมเดล (ใช้เป็น hint ได้)
+    rank = part_rank(problem)
+    for uids in problem.get('part_groups', {}).values():
+        same = [u for u in uids if u in rank]
+        got = sorted((placed.pop(u) for u in same if u in placed), key=lambda p: p[1])
+        placed.update(zip(same, got))
+    return placed
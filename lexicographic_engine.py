@@ -0,0 +1,160 @@
+"""Staged (lexicographic) optimisation instead of one weighted sum.
+
+Stages, in priority order: scheduled mandatory tasks (optional == 0),
+scheduled optional tasks, then (mode 2 only) the number of Ext.Time
+placements; fixed rows are reserved before any model is built. Stage k
+only models the tasks of levels <= k, so the high-priority stages are
+small and usually proven optimal in a fraction of a second. Every earlier level is pinned with a lower bound on its count.
+
+A 'seed' stage first solves the weighted model (as two_phase / joint do);
+if that finds nothing, the greedy timetable is the seed. Each stage is
+hinted with whichever of the seed and the previous stage's solution meets
+its bounds and ranks higher, and the seed is returned if the stages end up
+worse than it. A stage that finds nothing pins its level at the count of
+that hint, so lower stages never trade the level away. A seed proven
+optimal also bounds the weighted objective of the stages after the first
+(whose levels are pinned), which lets the solver prove them optimal once
+the bound is met. Time a stage does not use carries over to the next one.
+
+By default the stages run on the two-phase time model and rooms are picked
+per day afterwards (``assign_linked_rooms``, so ``part_link='room'`` holds);
+``time_model=False`` (or a failed room phase) runs them on the joint model.
+"""
+import time
+
+from ortools.sat.python import cp_model
+
+from scheduler_engine import build_candidates, build_model, is_ext_time, placement_objective, task_weight
+
+STAGES = ['mandatory', 'optional', 'penalty']
+STAGE_SHARE = {'seed': 0.2, 'mandatory': 0.3, 'optional': 0.3, 'penalty': 0.2}
+
+def task_level(t):
+    return 'mandatory' if t.get('opt') == 0 else 'optional'
+
+def solution_key(problem, sol):
+    """(mandatory count, optional count, -Ext.Time count) of a solution; larger is better."""
+    task_of, n, ext = {t['uid']: t for t in problem['tasks']}, {'mandatory': 0, 'optional': 0}, 0
+    for uid, key in sol.items():
+        n[task_level(task_of[uid])] += 1
+        ext += is_ext_time(problem['cal'], key[-1], task_of[uid]['dur'])
+    return n['mandatory'], n['optional'], -ext if problem['mode'] == 2 else 0
+
+def run_stages(problem, cands, penalty_score, budget, time_model, progress=None, t0=None):
+    """Solve the seed and the stages in order; returns (uid -> solution key tail, per-stage info).
+
+    The key tail is (day, start) for the time model and (class, day, start) for the joint model."""
+    from two_phase_engine import build_time_model
+    builder = build_time_model if time_model else build_model
+    t0 = time.perf_counter() if t0 is None else t0
+    cal, all_tasks = problem['cal'], problem['tasks']
+    dur = {t['uid']: t['dur'] for t in all_tasks}
+    stages, bounds, sol, seed, carry, last = {}, {}, None, None, 0.0, None
+    weight, pen = {t['uid']: task_weight(t) for t in all_tasks}, penalty_score if problem['mode'] == 2 else 0
+
+    def solve(model, name, ts):
+        """Solve within the stage's budget plus carry, counted from ``ts`` (stage start, model build included)."""
+        nonlocal carry
+        limit = budget.get(name, 0) + carry
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = max(0.5, limit - (time.perf_counter() - ts))
+        status = solver.Solve(model)
+        carry = max(0.0, limit - (time.perf_counter() - ts))
+        return solver, status
+
+    # seed: โมเดลถ่วงน้ำหนักทั้งก้อน ใช้เป็น hint และเป็นคำตอบขั้นต่ำ
+    ts = time.perf_counter()
+    model, index = builder(problem, cands, penalty_score)
+    lits = index['y' if time_model else 'x']
+    solver, status = solve(model, 'seed', ts)
+    if status in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
+        seed = {key[0]: key[1:] for key, v in lits.items() if solver.Value(v)}
+        if progress and not time_model:
+            progress({'objective': placement_objective(problem, seed, penalty_score), 'wall_time': time.perf_counter() - t0})
+    stages['seed'] = {'value': None if seed is None else int(round(solver.ObjectiveValue())),
+                      'optimal': status == cp_model.OPTIMAL, 'wall_time': time.perf_counter() - t0}
+    if seed is None:  # ไม่มีคำตอบถ่วงน้ำหนัก: ใช้ greedy เป็นคำตอบขั้นต่ำแทน
+        from greedy_engine import solve_greedy
+        greedy = solve_greedy(problem)
+        seed = {uid: key[1:] if time_model else key for uid, key in greedy.items()}
+        stages['seed'] = {'value': placement_objective(problem, greedy, penalty_score), 'optimal': False,
+                          'wall_time': time.perf_counter() - t0, 'greedy': True}
+
+    if problem['mode'] != 2: stages['penalty'] = {'value': 0, 'optimal': True, 'wall_time': 0.0}
+    for name in STAGES[:2]:
+        if not any(task_level(t) == name for t in all_tasks):
+            stages[name], bounds[name] = {'value': 0, 'optimal': True, 'wall_time': 0.0}, 0
+
+    for k, name in enumerate(STAGES):
+        if name in stages: continue
+        ts = time.perf_counter()
+        if name != 'penalty':
+            last = name
+            levels = STAGES[:k + 1]
+            sub = {**problem, 'tasks': [t for t in problem['tasks'] if task_level(t) in levels]}
+            model, index = builder(sub, cands, penalty_score)
+            lits, is_sched = index['y' if time_model else 'x'], index['is_sched']
+            for lv, value in bounds.items():
+                model.Add(sum(is_sched[t['uid']] for t in all_tasks if task_level(t) == lv) >= value)
+            expr = sum(is_sched[t['uid']] for t in all_tasks if task_level(t) == name)
+            if stages['seed']['optimal'] and bounds:  # ทุกคำตอบของ stage ก็เป็นคำตอบของโมเดลถ่วงน้ำหนัก -> ไม่เกินค่า seed
+                model.Add(sum(v * weight[u] for u, v in is_sched.items())
+                          - sum(v * pen for key, v in lits.items() if pen and is_ext_time(cal, key[-1], dur[key[0]]))
+                          <= stages['seed']['value'])
+            model.Maximize(expr)
+        elif last is None:
+            break
+        else:  # ใช้โมเดลของ stage ก่อนหน้า (มีครบทุกงานแล้ว) แค่เปลี่ยนเป้าหมาย
+            model.Add(expr >= bounds[last])
+            model.Minimize(sum(v for key, v in lits.items() if is_ext_time(cal, key[-1], dur[key[0]])))
+        model.ClearHints()
+        # hint: คำตอบที่ผ่าน bound ของ stage นี้และดีกว่า (seed หรือ stage ก่อนหน้า)
+        fits = [h for h in (sol, seed) if h is not None and
+                all(c >= bounds.get(lv, 0) for lv, c in zip(STAGES[:2], solution_key(problem, h)))]
+        hint = max(fits, key=lambda h: solution_key(problem, h), default=None)
+        if hint:
+            for key, v in lits.items(): model.AddHint(v, int(hint.get(key[0]) == key[1:]))
+            for uid, v in is_sched.items(): model.AddHint(v, int(uid in hint))
+
+        solver, status = solve(model, name, ts)
+        if status not in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
+            stages[name] = {'value': None, 'optimal': False, 'wall_time': time.perf_counter() - t0}
+            if hint is None: break  # ไม่มีคำตอบที่รู้จักให้ตรึงระดับนี้: หยุดและคืนคำตอบที่ดีที่สุดที่มี
+            # ตรึงระดับนี้ไว้ที่คำตอบที่รู้จัก ไม่ใช่ 0 (ไม่งั้น stage ถัดไปทิ้งงานระดับสูงได้)
+            if name != 'penalty': bounds[name] = solution_key(problem, hint)[STAGES.index(name)]
+            sol = hint
+            continue
+        bounds[name] = int(round(solver.ObjectiveValue()))
+        sol = {key[0]: key[1:] for key, v in lits.items() if solver.Value(v)}
+        stages[name] = {'value': bounds[name], 'optimal': status == cp_model.OPTIMAL, 'wall_time': time.perf_counter() - t0}
+        if progress and not time_model:
+            progress({'objective': placement_objective(problem, sol, penalty_score), 'wall_time': time.perf_counter() - t0})
+    if seed is not None and (sol is None or solution_key(problem, seed) > solution_key(problem, sol)):
+        sol = seed  # ไม่คืนคำตอบที่แย่กว่า seed
+    return sol, stages
+
+def solve_lexicographic(problem, solver_time, penalty_score, stage_times=None, time_model=True, progress=None, info=None):
+    """Returns uid -> (class, day, start), or None.
+
+    ``stage_times`` maps stage name -> seconds (default: ``STAGE_SHARE`` of
+    ``solver_time``; 'seed' keeps its share unless given). The joint-model
+    fallback shares whatever is left of that total. ``info``, if a dict,
+    receives per-stage {'value', 'optimal', 'wall_time'} under ``info['stages']``."""
+    from two_phase_engine import assign_linked_rooms
+    t0 = time.perf_counter()
+    budget = dict(stage_times or {k: solver_time * f for k, f in STAGE_SHARE.items()})
+    budget.setdefault('seed', solver_time * STAGE_SHARE['seed'])
+    cands = build_candidates(problem)
+    total, placed = sum(budget.values()), None
+    left = lambda: max(0.5, total - (time.perf_counter() - t0))
+    if time_model:
+        times, stages = run_stages(problem, cands, penalty_score, budget, True, t0=t0)
+        if times is not None:
+            placed = assign_linked_rooms(problem, times, cands, min(10, left()))
+        if placed is not None and progress:
+            progress({'objective': placement_objective(problem, placed, penalty_score), 'wall_time': time.perf_counter() - t0})
+    if placed is None:  # โมเดลรวม: แบ่งเวลาที่เหลือตามสัดส่วนเดิม
+        scale = left() / total
+        placed, stages = run_stages(problem, cands, penalty_score, {k: v * scale for k, v in budget.items()}, False, progress, t0)
+    if info is not None: info['stages'] = stages
+    return placed
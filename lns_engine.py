@@ -0,0 +1,87 @@
+from ortools.sat.python import cp_model
+import random
+import time
+from collections import defaultdict
+
+from scheduler_engine import build_candidates, build_model, placement_objective, is_ext_time
+
+# ==========================================
+# Neighbourhoods
+# ==========================================
+def pick_neighbourhood(problem, placed, rng, max_extra=30):
+    """uids to relax: one day, one teacher's tasks or one room class, plus up to
+    ``max_extra`` randomly sampled unscheduled/Ext.Time tasks."""
+    all_tasks = problem['tasks']
+    kind = rng.choice(['day', 'teacher', 'room'])
+    if kind == 'day':
+        d = rng.randrange(len(problem['days']))
+        chosen = {uid for uid, (_, day, _) in placed.items() if day == d}
+    elif kind == 'teacher':
+        tid = rng.choice(sorted({tid for t in all_tasks for tid in t['tea']}))
+        chosen = {t['uid'] for t in all_tasks if tid in t['tea']}
+    else:
+        used = sorted({c for c, _, _ in placed.values()})
+        c = rng.choice(used) if used else None
+        chosen = {uid for uid, (pc, _, _) in placed.items() if pc == c}
+    cal = problem['cal']
+    extra = [t['uid'] for t in all_tasks if t['uid'] not in chosen and
+             (t['uid'] not in placed or is_ext_time(cal, placed[t['uid']][2], t['dur']))]
+    chosen.update(rng.sample(extra, min(len(extra), max_extra)))
+    return kind, chosen
+
+# ==========================================
+# LNS loop
+# ==========================================
+def solve_lns(problem, solver_time, penalty_score, sub_time=5.0, seed=0, progress=None):
+    """Anytime improvement: start from the two-phase solution (greedy if that
+    fails), then repeatedly relax a neighbourhood of the joint model and
+    re-solve it with hints until ``solver_time`` seconds of wall clock are
+    spent. Each sub-solve only gets the time left after building its
+    neighbourhood."""
+    from greedy_engine import solve_greedy
+    from two_phase_engine import solve_two_phase
+    t0 = time.perf_counter()
+    deadline = t0 + solver_time
+    rng = random.Random(seed)
+    cands = build_candidates(problem)
+    model, index = build_model(problem, cands, penalty_score)
+    x, is_sched = index['x'], index['is_sched']
+    lits_of = defaultdict(list)
+    for key, v in x.items(): lits_of[key[0]].append((key, v))
+
+    info = {}
+    placed = solve_two_phase(problem, max(1.0, solver_time * 0.25), penalty_score, info=info)
+    if placed is None:  # เริ่มจาก greedy แทนตารางว่าง
+        placed = {uid: k for uid, k in solve_greedy(problem).items() if (uid, *k) in x}
+    best = placement_objective(problem, placed, penalty_score)
+    if progress: progress({'objective': best, 'wall_time': time.perf_counter() - t0})
+    if info.get('optimal'): return placed
+
+    while deadline - time.perf_counter() >= 0.5:
+        _, chosen = pick_neighbourhood(problem, placed, rng)
+
+        sub = model.Clone()
+        for uid, items in lits_of.items():
+            cur = placed.get(uid)
+            for key, v in items:
+                val = 1 if cur is not None and key[1:] == cur else 0
+                sv = sub.GetBoolVarFromProtoIndex(v.Index())
+                if uid not in chosen: sub.Add(sv == val)
+                sub.AddHint(sv, val)
+            sc = sub.GetBoolVarFromProtoIndex(is_sched[uid].Index())
+            if uid not in chosen: sub.Add(sc == int(cur is not None))
+            sub.AddHint(sc, int(cur is not None))
+
+        remaining = deadline - time.perf_counter()  # หลังสร้าง neighbourhood แล้ว
+        if remaining < 0.5: break
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = min(sub_time, remaining)
+        status = solver.Solve(sub)
+        if status not in [cp_model.OPTIMAL, cp_model.FEASIBLE]: continue
+        if solver.ObjectiveValue() > best + 1e-6:
+            placed = {k[0]: k[1:] for k, v in x.items() if solver.Value(v)}
+            best = solver.ObjectiveValue()
+            if progress: progress({'objective': best, 'wall_time': time.perf_counter() - t0})
+        # ปล่อยทุกงานแล้วยังพิสูจน์ได้ว่า optimal -> ไม่มีอะไรให้ปรับอีก
+        if status == cp_model.OPTIMAL and len(chosen) == len(lits_of): break
+    return placed or None
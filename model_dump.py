@@ -0,0 +1,56 @@
+"""Save a built CP-SAT model with the metadata needed to read its solutions.
+
+``export_model`` writes two files next to each other:
+
+    hard_term.pbtxt   the CpModelProto in text format
+    hard_term.json    tasks, calendar, room classes and the variable index
+
+``load_model`` reads them back into a ``CpModel`` plus that metadata, so
+a slow instance can be re-solved (see ``replay.py``) without the input
+files or any model-building time.
+"""
+import json
+import os
+import time
+
+from ortools.sat.python import cp_model
+
+DUMP_VERSION = 1
+
+def meta_path(path):
+    return os.path.splitext(path)[0] + '.json'
+
+def export_model(path, model, index, problem, penalty_score):
+    """Write ``model`` to ``path`` (.pbtxt) and its index metadata to the matching .json."""
+    if not path.endswith('.pbtxt'): path += '.pbtxt'
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    model.ExportToFile(path)
+    cal = problem['cal']
+    meta = {
+        'version': DUMP_VERSION, 'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'mode': problem['mode'], 'penalty_score': penalty_score,
+        'days': problem['days'], 'times': cal['times'], 'slot_minutes': cal['slot_minutes'],
+        'classes': [{'cid': c['cid'], 'rooms': c['rooms']} for c in problem['classes']],
+        'tasks': [{k: t.get(k) for k in ('uid', 'id', 'sec', 'type', 'dur', 'tea', 'opt')} for t in problem['tasks']],
+        'x': [[uid, c, d, s, v.Index()] for (uid, c, d, s), v in index['x'].items()],
+        'is_sched': {uid: v.Index() for uid, v in index['is_sched'].items()},
+    }
+    with open(meta_path(path), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, default=float)
+    return path
+
+def load_model(path):
+    """(CpModel, metadata) from files written by ``export_model``."""
+    model = cp_model.CpModel()
+    with open(path, encoding='utf-8') as f:
+        if not model.Proto().parse_text_format(f.read()):
+            raise ValueError(f"อ่านโมเดลจาก {path} ไม่ได้")
+    with open(meta_path(path), encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != DUMP_VERSION:
+        raise ValueError(f"{meta_path(path)}: dump version {meta.get('version')} ไม่รองรับ (ต้องเป็น {DUMP_VERSION})")
+    return model, meta
+
+def decode_placement(meta, value):
+    """uid -> (class, day, start) from a solution; ``value(var_index)`` returns 0/1."""
+    return {uid: (c, d, s) for uid, c, d, s, i in meta['x'] if value(i)}
@@ -0,0 +1,58 @@
+"""Re-solve a dumped model with different CP-SAT parameter sets.
+
+    python replay.py dumps/term1.pbtxt --time 30 --params "" "num_workers:1" "linearization_level:2 symmetry_level:0"
+
+Each parameter set is CP-SAT text format. The table shows time to first
+solution, best objective and bound; ``--curves`` saves every improving
+solution as {params: [{'objective', 'wall_time'}, ...]} in JSON.
+"""
+import argparse
+import json
+import time
+
+from ortools.sat.python import cp_model
+
+from benchmark import print_table
+from model_dump import decode_placement, load_model
+from scheduler_engine import ProgressCallback
+
+def replay(model, meta, params, solver_time):
+    """Solve once with ``params``; returns (table row, objective curve)."""
+    trace = []
+    solver = cp_model.CpSolver()
+    if params and not solver.parameters.parse_text_format(params):
+        raise ValueError(f"พารามิเตอร์ไม่ถูกต้อง: {params!r}")
+    solver.parameters.max_time_in_seconds = solver_time
+    t0 = time.perf_counter()
+    status = solver.Solve(model, ProgressCallback(trace.append))
+    wall = time.perf_counter() - t0
+    row = {'params': params or '(default)', 'status': solver.StatusName(status), 'wall_s': round(wall, 2),
+           'first_s': round(trace[0]['wall_time'], 2) if trace else '-', 'objective': '-', 'bound': '-', 'scheduled': 0}
+    if status in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
+        placed = decode_placement(meta, lambda i: solver.Value(model.GetBoolVarFromProtoIndex(i)))
+        row.update(objective=round(solver.ObjectiveValue()), bound=round(solver.BestObjectiveBound()), scheduled=len(placed))
+    return row, trace
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('dump', help="model file written by calculate_schedule(dump_path=...)")
+    ap.add_argument('--params', nargs='+', default=[''], help="CP-SAT parameter sets in text format")
+    ap.add_argument('--time', type=float, default=30, help="time limit per parameter set (s)")
+    ap.add_argument('--curves', help="write objective/time curves to this JSON file")
+    args = ap.parse_args()
+
+    for p in args.params:
+        if p and not cp_model.CpSolver().parameters.parse_text_format(p): ap.error(f"invalid parameter set: {p!r}")
+    model, meta = load_model(args.dump)
+    print(f"{args.dump}: {len(meta['tasks'])} tasks, {len(meta['x'])} placement literals, "
+          f"mode {meta['mode']}, dumped {meta['created']}")
+    rows, curves = [], {}
+    for p in args.params:
+        row, trace = replay(model, meta, p, args.time)
+        rows.append(row); curves[row['params']] = trace
+    print_table(rows)
+    if args.curves:
+        with open(args.curves, 'w', encoding='utf-8') as f: json.dump(curves, f, indent=1)
+
+if __name__ == "__main__":
+    main()
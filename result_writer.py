@@ -0,0 +1,81 @@
+"""Stream schedule rows to CSV, JSON Lines or Parquet.
+
+Every writer takes an iterable of ``ScheduleRow`` (e.g. ``iter_result``)
+or a result DataFrame. Rows are written as they arrive (Parquet in
+row-group batches), so memory stays flat however long the schedule is:
+
+    write_result(iter_result(problem, placed), 'term1.parquet')
+    payload = encode(df_res)           # bytes for st.download_button, encode once per result
+"""
+import csv
+import io
+import json
+import os
+
+import pandas as pd
+
+from schedule_row import ScheduleRow, as_row
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: CSV / JSONL only
+    pa = pq = None
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.parquet': 'parquet'}
+BATCH_ROWS = 50_000
+
+def iter_rows(src):
+    """ScheduleRow tuples from a result DataFrame, row by row; any other iterable passes through."""
+    if isinstance(src, pd.DataFrame):
+        return (as_row(r) for r in src[list(ScheduleRow._fields)].itertuples(index=False, name=None))
+    return iter(src)
+
+def write_csv(rows, f):
+    w = csv.writer(f, lineterminator='\n')
+    w.writerow(ScheduleRow._fields)
+    n = 0
+    for r in iter_rows(rows):
+        w.writerow(r); n += 1
+    return n
+
+def write_jsonl(rows, f):
+    n = 0
+    for r in iter_rows(rows):
+        f.write(json.dumps(r._asdict(), ensure_ascii=False) + "\n"); n += 1
+    return n
+
+def write_parquet(rows, f, batch_rows=BATCH_ROWS):
+    if pq is None: raise ImportError("ต้องติดตั้ง pyarrow เพื่อเขียนไฟล์ Parquet")
+    types = {str: pa.string(), int: pa.int64()}
+    schema = pa.schema([(k, types[typ]) for k, typ in ScheduleRow.__annotations__.items()])
+    n, batch = 0, []
+    with pq.ParquetWriter(f, schema) as w:
+        for r in iter_rows(rows):
+            batch.append(r)
+            if len(batch) >= batch_rows:
+                w.write_table(pa.Table.from_pylist([b._asdict() for b in batch], schema)); n += len(batch); batch = []
+        # เขียน batch สุดท้ายเสมอ แม้ว่าง เพื่อให้ไฟล์มี row group อย่างน้อยหนึ่งชุด
+        w.write_table(pa.Table.from_pylist([b._asdict() for b in batch], schema)); n += len(batch)
+    return n
+
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl, 'parquet': write_parquet}
+
+def write_result(rows, path, fmt=None, encoding='utf-8-sig'):
+    """Write rows to ``path``; format from ``fmt`` or the file extension. Returns the row count."""
+    fmt = fmt or FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt not in WRITERS: raise ValueError(f"ไม่รู้จักรูปแบบไฟล์ {path!r} (รองรับ {', '.join(FORMATS)})")
+    if fmt == 'parquet': return write_parquet(rows, path)
+    with open(path, 'w', encoding=encoding if fmt == 'csv' else 'utf-8', newline='') as f:
+        return WRITERS[fmt](rows, f)
+
+def encode(rows, fmt='csv', encoding='utf-8-sig'):
+    """The whole result as bytes in one pass (download payload)."""
+    buf = io.BytesIO()
+    if fmt == 'parquet':
+        write_parquet(rows, buf)
+    else:
+        f = io.TextIOWrapper(buf, encoding=encoding if fmt == 'csv' else 'utf-8', newline='')
+        WRITERS[fmt](rows, f)
+        f.flush(); f.detach()
+    return buf.getvalue()
@@ -0,0 +1,116 @@
+"""Quality metrics of a finished timetable.
+
+The result DataFrame is turned into integer occupancy tensors
+(entity x day x slot) once; every metric is then a NumPy reduction over
+those, so a full report takes milliseconds:
+
+    report = analyze(df_res)           # plain dict, ready for json.dumps
+    report['rooms']['utilization']     # overall share of open room-slots in use
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+from slot_calendar import compile_calendar, to_minutes
+
+NON_ENTITIES = ('-', 'Unknown', 'Online', '')
+
+def occupancy_tensor(df, cal, column, names=None):
+    """(entity names, int array entities x days x slots) of how many classes each entity has per slot.
+
+    ``column`` is 'Room', 'Teacher' (comma-separated ids are split) or any
+    other column of per-row labels such as a cohort. ``names`` fixes the
+    entity axis (e.g. every room, used or not); rows naming anything else
+    are ignored."""
+    n_days, n_slots = len(cal['days']), cal['n_slots']
+    if df.empty: return list(names or []), np.zeros((len(names or []), n_days, n_slots), dtype=int)
+    labels = df[column].astype(str).str.split(',') if column == 'Teacher' else df[column].astype(str).map(lambda v: [v])
+    rows = labels.explode().str.strip()
+    rows = rows[~rows.isin(NON_ENTITIES)]
+    names = sorted(rows.unique()) if names is None else list(names)
+    rows = rows[rows.isin(names)]
+    if not names or rows.empty: return names, np.zeros((len(names), n_days, n_slots), dtype=int)
+    src = df.loc[rows.index]
+    e = pd.Categorical(rows, categories=names).codes
+    d = src['Day'].map({day: i for i, day in enumerate(cal['days'])}).to_numpy()
+    t0 = cal['minutes'][0]
+    s = (src['Start'].map(to_minutes).to_numpy() - t0) // cal['slot_minutes']
+    f = (src['End'].map(to_minutes).to_numpy() - t0) // cal['slot_minutes']
+    # difference array: +1 ที่คาบเริ่ม, -1 ที่คาบจบ แล้ว cumsum ตามแกนเวลา
+    diff = np.zeros((len(names), n_days, n_slots + 1), dtype=int)
+    np.add.at(diff, (e, d, s), 1)
+    np.add.at(diff, (e, d, f), -1)
+    return names, np.cumsum(diff, axis=2)[:, :, :n_slots]
+
+def day_spans(occ):
+    """Per entity and day: (busy slots, first busy slot, last busy slot); first/last are -1 on free days."""
+    busy = occ > 0
+    count = busy.sum(axis=2)
+    first = np.where(count > 0, busy.argmax(axis=2), -1)
+    last = np.where(count > 0, busy.shape[2] - 1 - busy[:, :, ::-1].argmax(axis=2), -1)
+    return count, first, last
+
+def analyze(df, calendar=None):
+    """Utilization, idle gaps, loads, Ext.Time, unscheduled tasks and cohort spread as a JSON-ready dict."""
+    cal = compile_calendar(calendar)
+    step, days = cal['slot_minutes'], cal['days']
+    hours = lambda slots: round(float(slots) * step / 60, 2)
+    report = {'rows': int(len(df)), 'slot_minutes': step}
+
+    # Rooms: ใช้ไปกี่ % ของคาบที่เปิดสอนได้ (ทุกห้องใน room.csv ถ้ารู้)
+    all_rooms = df.attrs.get('rooms')
+    names, occ = occupancy_tensor(df, cal, 'Room', sorted(set(all_rooms)) if all_rooms else None)
+    open_slots = int(cal['open'].sum())
+    used = (occ > 0).sum(axis=(1, 2))
+    report['rooms'] = {
+        'utilization': round(float(used.sum()) / max(open_slots * len(names), 1), 3),
+        'per_room': {n: round(int(u) / max(open_slots, 1), 3) for n, u in zip(names, used)},
+        'per_day': {day: round(float((occ[:, i] > 0).sum()) / max(int(cal['open'][i].sum()) * len(names), 1), 3)
+                    for i, day in enumerate(days)},
+        'double_booked_slots': int(np.clip(occ - 1, 0, None).sum()),
+    }
+
+    # Teachers: ชั่วโมงสอนต่อวัน และช่วงว่างระหว่างคาบ
+    names, occ = occupancy_tensor(df, cal, 'Teacher')
+    count, first, last = day_spans(occ)
+    idle = np.where(count > 0, last - first + 1 - count, 0)
+    report['teachers'] = {
+        n: {'hours': hours(count[i].sum()), 'daily_hours': {day: hours(count[i, j]) for j, day in enumerate(days) if count[i, j]},
+            'max_daily_hours': hours(count[i].max()), 'idle_hours': hours(idle[i].sum()), 'days': int((count[i] > 0).sum())}
+        for i, n in enumerate(names)}
+    report['idle_hours_total'] = hours(idle.sum())
+
+    ext = df[df['Note'] == 'Ext.Time'] if 'Note' in df else df.iloc[0:0]
+    report['ext_time'] = {'count': int(len(ext)),
+                          'per_teacher': ext['Teacher'].str.split(',').explode().str.strip().value_counts().to_dict()}
+    report['daily_load_hours'] = {day: hours(((df['Day'] == day) * (df['End'].map(to_minutes) - df['Start'].map(to_minutes))).sum() / step)
+                                  for day in days} if len(df) else {}
+
+    report['unscheduled'] = list(df.attrs.get('unscheduled', []))
+    report['fixed_clashes'] = list(df.attrs.get('fixed_clashes', []))
+    report['candidate_budget'] = df.attrs.get('candidate_budget')  # None = ไม่ได้ตัดตัวเลือก
+
+    # Cohorts: กระจายกี่วัน ช่วงเวลาต่อวันยาวแค่ไหน และคาบซ้อนกันเท่าไร
+    cohort_of = df.attrs.get('cohorts', {})
+    if cohort_of and len(df):
+        tagged = df.assign(Cohort=(df['Course'].astype(str) + '|' + df['Sec'].astype(str)).map(cohort_of).fillna(''))
+        names, occ = occupancy_tensor(tagged, cal, 'Cohort')
+        count, first, last = day_spans(occ)
+        span = np.where(count > 0, last - first + 1, 0)
+        report['cohorts'] = {
+            n: {'days': int((count[i] > 0).sum()),
+                'mean_daily_span_hours': hours(span[i].sum() / max(int((count[i] > 0).sum()), 1)),
+                'overlap_slots': int(np.clip(occ[i] - 1, 0, None).sum())}
+            for i, n in enumerate(names)}
+    else:
+        report['cohorts'] = {}
+    return report
+
+def to_json(report, **kwargs):
+    return json.dumps(report, ensure_ascii=False, **kwargs)
+
+if __name__ == "__main__":
+    import sys
+    # python schedule_analytics.py schedule.csv  -> JSON (ไม่มีรายการที่จัดไม่ได้ เพราะ CSV ไม่เก็บไว้)
+    print(to_json(analyze(pd.read_csv(sys.argv[1], dtype={'Start': str, 'End': str}, keep_default_na=False)), indent=1))
@@ -0,0 +1,22 @@
+"""Layout of one result row, shared by ``scheduler_engine`` and ``result_writer``.
+
+Kept free of pandas and OR-Tools so that writing or reading result files
+does not load the solver stack.
+"""
+from typing import NamedTuple
+
+class ScheduleRow(NamedTuple):
+    """One placed task. Times are HH:MM strings; ``Sec`` is the section number."""
+    Day: str
+    Start: str
+    End: str
+    Room: str
+    Course: str
+    Sec: int
+    Type: str
+    Teacher: str
+    Note: str
+
+def as_row(values):
+    """ScheduleRow from raw values (e.g. a DataFrame or CSV row), each cast to its field type."""
+    return ScheduleRow(*(typ(v) for typ, v in zip(ScheduleRow.__annotations__.values(), values)))
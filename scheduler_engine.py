@@ -1,148 +1,684 @@
 import pandas as pd
+import numpy as np
 from ortools.sat.python import cp_model
-import math
 import re
+import time
 from collections import defaultdict
 
-def get_slot_map():
-    slots = {}
-    t_start = 8.5
-    idx = 0
-    while t_start <= 19.0: # ครอบคลุมถึงเวลาเลิก 19:00
-        h, m = int(t_start), round((t_start % 1) * 60)
-        slots[idx] = {'time': f"{h:02d}:{m:02d}", 'val': t_start, 'is_lunch': (12.5 <= t_start < 13.0)}
-        idx += 1; t_start += 0.5
-    return slots
-
-def parse_unavailable_time(val, days, inv):
-    res = {i: set() for i in range(len(days))}
-    if pd.isna(val) or not val: return res
+from dataset_cache import DatasetError, load_datasets
+from schedule_row import ScheduleRow
+from slot_calendar import compile_calendar, duration_slots, is_ext_time, slot_of, slots_between, window_ok
+
+MAX_PART_MINUTES = 180 # คาบบรรยายยาวกว่านี้จะถูกแบ่งเป็น P1, P2, ...
+
+def parse_unavailable_time(val, cal, teacher_busy=None):
+    """'Mon 08:30-10:00' (or a list of those) -> bool array (days x slots), True = unavailable."""
+    res = np.zeros((len(cal['days']), cal['n_slots']), dtype=bool) if teacher_busy is None else teacher_busy
+    if not isinstance(val, list) and (pd.isna(val) or not val): return res
     items = val if isinstance(val, list) else [str(val)]
     for it in items:
-        m = re.search(r"(\w{3})\s+(\d{1,2}[:.]\d{2})-(\d{1,2}[:.]\d{2})", str(it))
-        if m:
-            d, s, e = m.groups()
-            s_f = s.replace('.', ':'); e_f = e.replace('.', ':')
-            if d in days and s_f in inv and e_f in inv:
-                for i in range(inv[s_f], inv[e_f]): res[days.index(d)].add(i)
+        for d, s, e in re.findall(r"(\w{3})\s+(\d{1,2}[:.]\d{2})-(\d{1,2}[:.]\d{2})", str(it)):
+            if d in cal['days']: res[cal['days'].index(d), slots_between(cal, s, e)] = True
+    return res
+
+# ==========================================
+# Room classes & eligibility
+# ==========================================
+def room_features(room_type):
+    """'lab network' -> {'lab', 'network'}"""
+    return frozenset(str(room_type).lower().replace('_', ' ').split())
+
+def task_requirements(t):
+    """Room features a task needs; online tasks only go to the virtual room."""
+    if t.get('online'): return frozenset({'virtual'})
+    req = set()
+    if t.get('type') == 'Lab':
+        req.add('lab')
+        if t.get('lab_ai'): req.add('ai')
+        if t.get('lab_network'): req.add('network')
+    return frozenset(req)
+
+def build_room_classes(room_list, pinned=()):
+    """Pool rooms with identical attributes into classes.
+
+    Rooms named in ``pinned`` (targets of fixed rows) get a class of their own
+    so that a reserved fixed row blocks only the room it asked for."""
+    classes, by_key = [], {}
+    for r in room_list:
+        name = str(r['room'])
+        feats = room_features(r.get('type', ''))
+        cap = 0 if pd.isna(r.get('capacity')) else int(r['capacity'])
+        key = (name,) if name in pinned else (feats, cap, str(r.get('building', '')))
+        if key not in by_key:
+            by_key[key] = len(classes)
+            classes.append({'cid': f"C{len(classes)}", 'rooms': [], 'features': feats, 'capacity': cap,
+                            'building': str(r.get('building', '')), 'virtual': 'virtual' in feats})
+        classes[by_key[key]]['rooms'].append(name)
+    return classes
+
+def eligible_classes(t, classes, cache=None):
+    """Indices of the room classes a task may use (task-class x room-class matrix, memoized)."""
+    key = (task_requirements(t), int(t.get('std', 0) or 0))
+    if cache is not None and key in cache: return cache[key]
+    req, std = key
+    res = []
+    for i, c in enumerate(classes):
+        if c['virtual'] != ('virtual' in req): continue
+        elif not req <= c['features'] or c['capacity'] < std: continue
+        res.append(i)
+    if cache is not None: cache[key] = res
     return res
 
-def calculate_schedule(files, mode, solver_time, penalty_score):
-    SLOT_MAP = get_slot_map()
-    DAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri']
-    SLOT_INV = {v['time']: k for k, v in SLOT_MAP.items()}
-    TOTAL_SLOTS = len(SLOT_MAP)
+# ==========================================
+# Problem construction
+# ==========================================
+INPUT_KEYS = ['room', 'teacher_courses', 'ai_in', 'cy_in', 'all_teachers', 'ai_out', 'cy_out']
+
+def build_problem(files, mode, calendar=None, reserved=None):
+    """Read the input files and turn them into tasks, room classes and the slot grid.
+
+    Inputs go through ``dataset_cache.load_datasets``: schema errors raise
+    ``DatasetError`` and unchanged files load from their columnar snapshot.
+    ``calendar`` is a ``slot_calendar`` config (or compiled calendar).
+    ``reserved`` ({'rooms': {room: mask}, 'teachers': {tid: mask}}, masks
+    days x slots) is occupancy taken by other runs, e.g. a batch ledger."""
+    cal = compile_calendar(calendar)
+    DAYS = cal['days']
+    data = load_datasets({k: files.get(k) for k in INPUT_KEYS})
+
+    room_list = data['room'].to_dict('records')
+    room_list.append({'room': 'Online', 'capacity': 9999, 'type': 'virtual'})
+    df_tc = data['teacher_courses']
+    df_courses = pd.concat([data[k].assign(cohort=k.split('_')[0].upper()) for k in ('ai_in', 'cy_in') if k in data],
+                           ignore_index=True).fillna(0)
+    df_teacher = data['all_teachers']
+
+    t_map = defaultdict(list)
+    for _, r in df_tc.iterrows(): t_map[str(r['course_code']).strip()].append(str(r['teacher_id']).strip())
+    un_map = {}
+    for _, r in df_teacher.iterrows():
+        tid = str(r['teacher_id']).strip()
+        un_map[tid] = parse_unavailable_time(r.get('unavailable_times'), cal, un_map.get(tid))
+
+    # 1. Fixed Schedule (ai_out, cy_out)
+    fixed_tasks, fixed_issues = [], []
+    for key in ['ai_out', 'cy_out']:
+        if key in data:
+            df_f = data[key]
+            for _, r in df_f.iterrows():
+                d_i = DAYS.index(str(r['day'])[:3]) if str(r['day'])[:3] in DAYS else -1
+                s_i = slot_of(cal, r['start'])
+                dur = duration_slots(cal, r.get('lecture_hour', 0) + r.get('lab_hour', 0))
+                if d_i != -1 and s_i != -1:
+                    fixed_tasks.append({
+                        'uid': f"FIX_{r['course_code']}_{r['section']}", 'id': str(r['course_code']),
+                        'sec': int(r['section']), 'dur': dur, 'type': 'Fixed',
+                        'tea': t_map.get(str(r['course_code']).strip(), ['-']),
+                        'fixed_room': True, 'target_room': str(r['room']), 'f_d': d_i, 'f_s': s_i,
+                        'cohort': key.split('_')[0].upper()
+                    })
+                else:
+                    fixed_issues.append(f"{key}: {r['course_code']} sec {r['section']} {r['day']} {r['start']} ไม่อยู่ในตารางเวลา")
+
+    # 2. Dynamic Tasks
+    tasks = []
+    for _, r in df_courses.iterrows():
+        c, s = str(r['course_code']).strip(), int(r['section'])
+        tea, opt = t_map.get(c, ['Unknown']), r.get('optional', 1)
+        lec_slots, max_part = duration_slots(cal, r['lecture_hour']), max(1, MAX_PART_MINUTES // cal['slot_minutes'])
+        multi, p = lec_slots > max_part, 1
+        while lec_slots > 0:
+            dur = min(lec_slots, max_part)
+            uid = f"{c}_S{s}_Lec_P{p}"
+            if not any(tk['uid'] == uid for tk in fixed_tasks):
+                tasks.append({'uid': uid, 'id': c, 'sec': s, 'type': 'Lec', 'dur': dur, 'std': r['enrollment_count'], 'tea': tea, 'opt': opt, 'online': r.get('lec_online')==1, 'cohort': r['cohort']})
+                if multi: tasks[-1].update(group=f"{c}_S{s}_Lec", part=p)  # ส่วนของ section เดียวกัน (ดู add_part_links)
+            lec_slots -= dur; p += 1
+        lab_dur = duration_slots(cal, r['lab_hour'])
+        if lab_dur > 0:
+            uid = f"{c}_S{s}_Lab"
+            if not any(tk['uid'] == uid for tk in fixed_tasks):
+                tasks.append({'uid': uid, 'id': c, 'sec': s, 'type': 'Lab', 'dur': lab_dur, 'std': r['enrollment_count'], 'tea': tea, 'opt': opt, 'online': r.get('lab_online')==1,
+                              'lab_ai': r.get('require_lab_ai') == 1, 'lab_network': r.get('require_lab_network') == 1, 'cohort': r['cohort']})
+
+    # แถวซ้ำ (เช่น fixed วิชาเดียวกันหลายวัน) ต้องได้ uid ไม่ซ้ำกัน ไม่อย่างนั้นตัวแปรจะถูกใช้ร่วมกัน
+    seen = defaultdict(int)
+    for t in fixed_tasks + tasks:
+        seen[t['uid']] += 1
+        if seen[t['uid']] > 1: t['uid'] = f"{t['uid']}_{seen[t['uid']]}"
+
+    reserved = reserved or {'rooms': {}, 'teachers': {}}
+    classes = build_room_classes(room_list, pinned={t['target_room'] for t in fixed_tasks} | set(reserved['rooms']))
+    fixed_placed, room_blocked, clashes = reserve_fixed(fixed_tasks, classes, cal, un_map, reserved)
+    return {'cal': cal, 'days': DAYS, 'mode': mode,
+            'un_map': un_map, 'rooms': room_list, 'classes': classes,
+            'fixed_tasks': [t for t in fixed_tasks if t['uid'] in fixed_placed], 'fixed_placed': fixed_placed,
+            'room_blocked': room_blocked, 'fixed_clashes': fixed_issues + clashes, 'tasks': tasks,
+            'part_groups': part_groups(tasks)}
+
+def part_groups(tasks):
+    """Lecture section -> uids of its parts in part order, for sections split into several parts."""
+    groups = defaultdict(list)
+    for t in sorted((t for t in tasks if t.get('group')), key=lambda t: t['part']): groups[t['group']].append(t['uid'])
+    return {g: uids for g, uids in groups.items() if len(uids) > 1}
+
+def part_rank(problem):
+    """uid -> position among the leading equal-length parts of its section.
+
+    Those parts are interchangeable, so the models order them by day: the
+    part at position i can only start on day i or later."""
+    dur, rank = {t['uid']: t['dur'] for t in problem['tasks']}, {}
+    for uids in problem.get('part_groups', {}).values():
+        uids = [u for u in uids if u in dur]
+        for i, u in enumerate(uids):
+            if dur[u] != dur[uids[0]]: break
+            rank[u] = i
+    return rank
+
+def reserve_fixed(fixed_tasks, classes, cal, un_map, reserved=None):
+    """Compile fixed rows into occupancy masks instead of model variables.
+
+    Returns (placed, room_blocked, clashes): fixed uid -> (class index or
+    None, day, start); class index -> bool mask (days x slots) of reserved
+    slots; and one message per fixed row that overlaps an earlier fixed row
+    in the same room or with the same teacher (such rows are not reserved).
+    A section listed twice at the same time (e.g. in both ai_out and
+    cy_out) is one meeting and is reserved once.
+    Reserved teacher slots are OR-ed into ``un_map``, so the other tasks'
+    start domains are pruned by ``feasible_starts``. Occupancy in
+    ``reserved`` (see ``build_problem``) blocks fixed rows and is merged in
+    the same way."""
+    shape = (len(cal['days']), cal['n_slots'])
+    reserved = reserved or {'rooms': {}, 'teachers': {}}
+    ledger = {**{('ห้อง', rm): m for rm, m in reserved['rooms'].items()},
+              **{('อาจารย์', tid): m for tid, m in reserved['teachers'].items()}}
+    class_of = {rm: i for i, c in enumerate(classes) for rm in c['rooms']}
+    owner, placed, blocked, clashes, meetings = {}, {}, {}, [], set()
+    for t in fixed_tasks:
+        d, s = t['f_d'], t['f_s']
+        if (t['id'], t['sec'], d, s) in meetings: continue
+        meetings.add((t['id'], t['sec'], d, s))
+        if s + t['dur'] > cal['n_slots']:
+            clashes.append(f"{t['id']} sec {t['sec']} ({cal['days'][d]} {cal['times'][s]}) เลยเวลาปิดของตาราง"); continue
+        keys = [('ห้อง', t['target_room'])] + [('อาจารย์', tid) for tid in t['tea'] if tid not in ('-', 'Unknown')]
+        hit = next(((k, owner[(k, d, i)]) for k in keys for i in range(s, s + t['dur']) if (k, d, i) in owner), None)
+        if hit:
+            (kind, name), other = hit
+            clashes.append(f"{t['id']} sec {t['sec']} ({cal['days'][d]} {cal['times'][s]}) ชนกับ {other['id']} sec {other['sec']} ({kind} {name})")
+            continue
+        hit = next((k for k in keys if k in ledger and ledger[k][d, s:s + t['dur']].any()), None)
+        if hit:
+            clashes.append(f"{t['id']} sec {t['sec']} ({cal['days'][d]} {cal['times'][s]}) ชนกับตารางที่จองไว้แล้ว ({hit[0]} {hit[1]})")
+            continue
+        for k in keys:
+            for i in range(s, s + t['dur']): owner[(k, d, i)] = t
+        c = class_of.get(t['target_room'])
+        placed[t['uid']] = (c, d, s)
+        if c is not None: blocked.setdefault(c, np.zeros(shape, dtype=bool))[d, s:s + t['dur']] = True
+        for tid in t['tea']:
+            if tid in ('-', 'Unknown'): continue
+            un_map.setdefault(tid, np.zeros(shape, dtype=bool))[d, s:s + t['dur']] = True
+    for rm, mask in reserved['rooms'].items():
+        if rm in class_of: blocked.setdefault(class_of[rm], np.zeros(shape, dtype=bool))[:] |= mask
+    for tid, mask in reserved['teachers'].items():
+        un_map.setdefault(tid, np.zeros(shape, dtype=bool))[:] |= mask
+    return placed, blocked, clashes
+
+def feasible_starts(t, d, problem):
+    """Start slots on day ``d`` that respect mode, lunch, day hours and teacher availability."""
+    cal, un_map = problem['cal'], problem['un_map']
+    mask = cal['open'][d].copy()
+    if problem['mode'] == 1: mask &= cal['core']
+    for tid in t['tea']:
+        if tid in un_map: mask &= ~un_map[tid][d]
+    return np.flatnonzero(window_ok(mask, t['dur'])).tolist()
+
+def build_candidates(problem):
+    """uid -> list of (class index, day, start) placements.
+
+    Fixed tasks are not candidates: they are reserved up front, and starts
+    that would overlap a reserved room are dropped here. With
+    ``part_link='start'`` the parts of a section keep their common starts
+    only, and after top-K pruning every part keeps a candidate at each start
+    any of them kept, so linked parts always share a start."""
+    elig_cache, start_cache, cands = {}, {}, {}
+    blocked, free_cache, part_cache = problem.get('room_blocked', {}), {}, {}
+    rank = part_rank(problem)
+    for t in problem['tasks']:
+        pk = (t.get('group'), t['dur'])
+        if pk[0] and pk in part_cache:  # ส่วนยาวเท่ากันของ section เดียวกันใช้ตัวเลือกชุดเดียวกัน
+            cands[t['uid']] = [k for k in part_cache[pk] if k[1] >= rank.get(t['uid'], 0)]
+            continue
+        cls = eligible_classes(t, problem['classes'], elig_cache)
+        out = []
+        for d in range(len(problem['days'])):
+            key = (t['dur'], tuple(t['tea']), d)
+            if key not in start_cache: start_cache[key] = feasible_starts(t, d, problem)
+            for c in cls:
+                if c in blocked:
+                    fk = (c, d, t['dur'])
+                    if fk not in free_cache: free_cache[fk] = window_ok(~blocked[c][d], t['dur'])
+                    out.extend((c, d, s) for s in start_cache[key] if free_cache[fk][s])
+                else:
+                    out.extend((c, d, s) for s in start_cache[key])
+        if pk[0]: part_cache[pk] = out
+        cands[t['uid']] = [k for k in out if k[1] >= rank.get(t['uid'], 0)] if t['uid'] in rank else out
+    linked = [[u for u in uids if u in cands] for uids in problem.get('part_groups', {}).values()] if problem.get('part_link') == 'start' else []
+    for uids in linked:
+        # เวลาเริ่มต้องตรงกันทุกส่วน: เหลือเฉพาะเวลาที่ทุกส่วนเริ่มได้
+        common = set.intersection(*({s for _, _, s in cands[u]} for u in uids)) if uids else set()
+        for u in uids: cands[u] = [k for k in cands[u] if k[2] in common]
+    budget = problem.get('candidate_budget')
+    if not budget: return cands
+    kept = rank_candidates(problem, cands, budget)
+    for uids in linked:
+        # ตัดแยกกันแล้วเวลาเริ่มอาจไม่ตรงกัน: ทุกส่วนต้องมีอย่างน้อยหนึ่งตัวเลือกที่ทุกเวลาเริ่มที่ส่วนใดส่วนหนึ่งเก็บไว้
+        starts = {s for u in uids for _, _, s in kept[u]}
+        for u in uids:
+            have = {s for _, _, s in kept[u]}
+            for k in cands[u]:
+                if k[2] in starts and k[2] not in have: kept[u].append(k); have.add(k[2])
+    return kept
+
+def rank_candidates(problem, cands, budget):
+    """Keep the ``budget`` best candidates of every task (best first).
+
+    Ranking: in-window before Ext.Time, then the expected load of the
+    room-class slots plus the capacity left over. The load comes from a demand
+    histogram: every task spreads one unit over all of its candidates, per
+    room of the class. Leftover capacity is scaled by the largest room class,
+    so a tight room counts less than a busy slot."""
+    classes, cal, n_days = problem['classes'], problem['cal'], len(problem['days'])
+    demand = np.zeros((len(classes), n_days, cal['n_slots']))
+    for t in problem['tasks']:
+        cs = cands[t['uid']]
+        if not cs: continue
+        c, d, s = np.array(cs).T
+        for i in range(t['dur']): np.add.at(demand, (c, d, s + i), 1.0 / len(cs))
+    n_rooms = np.array([max(len(k['rooms']), 1) for k in classes])
+    max_cap = max([k['capacity'] for k in classes] + [1])
+    out = {}
+    for t in problem['tasks']:
+        cs = cands[t['uid']]
+        if len(cs) <= budget: out[t['uid']] = cs; continue
+        std = int(t.get('std', 0) or 0)
+        def key(k):
+            c, d, s = k
+            load = demand[c, d, s:s + t['dur']].sum() / n_rooms[c] / t['dur']
+            return (is_ext_time(cal, s, t['dur']), load + (classes[c]['capacity'] - std) / max_cap)
+        out[t['uid']] = sorted(cs, key=key)[:budget]
+    return out
+
+# ==========================================
+# CP-SAT model
+# ==========================================
+def task_weight(t):
+    return 1000 if t.get('opt')==0 else 100
+
+def class_buildings(classes):
+    """class index -> building, for physical rooms with a known building."""
+    return {c: cl['building'] for c, cl in enumerate(classes) if cl['building'] not in ('', 'nan') and not cl['virtual']}
+
+def add_travel_constraints(model, tea_bld, travel):
+    """No building change within ``travel`` slots for one teacher.
+
+    ``tea_bld[(tid, d, slot)][building]`` lists the literals that put the
+    teacher in that building at that slot. A teacher is in at most one
+    place per slot, so each list sums to <= 1. For each slot, building b
+    and look-ahead k <= travel, one constraint says "in b at slot i" and
+    "in another building at slot i+k" cannot both hold. That is
+    teachers x days x slots x travel x buildings constraints, independent of
+    how many tasks a teacher has."""
+    n = 0
+    for (tid, d, i), here in tea_bld.items():
+        for k in range(1, travel + 1):
+            there = tea_bld.get((tid, d, i + k))
+            if not there: continue
+            for b, lits in here.items():
+                other = [v for b2, vs in there.items() if b2 != b for v in vs]
+                if other:
+                    model.AddAtMostOne(lits + other); n += 1
+    return n
+
+def occupancy_rows(tasks, cands, cal, mode, tea_idx):
+    """Slot-level occupancy of ``tasks``' candidates as flat int arrays.
 
+    Candidates are numbered in task order, then candidate order. Returns
+    {'n': candidates, 'ext': bool[n] Ext.Time (mode 2 only), 'cls': rows
+    [cand, class, day, slot], 'tea': rows [cand, teacher, day, slot, class]}.
+    Nothing here touches CP-SAT, so chunks can run in worker processes."""
+    minutes, (c0, c1) = np.asarray(cal['minutes']), cal['core_window']
+    n, ext, cls, tea = 0, [], [], []
+    for t in tasks:
+        a = np.asarray(cands[t['uid']], dtype=np.int64).reshape(-1, 3)
+        k, dur = len(a), t['dur']
+        if not k: continue
+        ext.append((minutes[a[:, 2]] < c0) | (minutes[a[:, 2] + dur] > c1) if mode == 2 else np.zeros(k, dtype=bool))
+        cand = np.repeat(np.arange(n, n + k), dur)
+        c, d = np.repeat(a[:, 0], dur), np.repeat(a[:, 1], dur)
+        slot = np.repeat(a[:, 2], dur) + np.tile(np.arange(dur), k)
+        cls.append(np.stack([cand, c, d, slot], axis=1))
+        for tid in t['tea']: tea.append(np.stack([cand, np.full_like(cand, tea_idx[tid]), d, slot, c], axis=1))
+        n += k
+    cat = lambda parts, w: np.concatenate(parts) if parts else np.zeros((0, w), dtype=np.int64)
+    return {'n': n, 'ext': np.concatenate(ext) if ext else np.zeros(0, dtype=bool), 'cls': cat(cls, 4), 'tea': cat(tea, 5)}
+
+def _occupancy_chunk(args):
+    return occupancy_rows(*args)
+
+def model_occupancy(problem, cands, workers=None):
+    """``occupancy_rows`` of all tasks; with ``workers`` > 1 task chunks run in a process pool and are merged here."""
+    tasks, cal, mode = problem['tasks'], problem['cal'], problem['mode']
+    tea_idx = {tid: i for i, tid in enumerate(sorted({tid for t in tasks for tid in t['tea']}))}
+    if not workers or workers <= 1 or len(tasks) < 2 * workers:
+        return occupancy_rows(tasks, cands, cal, mode, tea_idx), tea_idx
+    from concurrent.futures import ProcessPoolExecutor
+    size = -(-len(tasks) // workers)
+    chunks = [tasks[i:i + size] for i in range(0, len(tasks), size)]  # ต่อเนื่องกัน: ลำดับ candidate เหมือนทำทีเดียว
+    # ส่งเฉพาะ candidate ของงานใน chunk นั้น ไม่ต้อง pickle ทั้ง problem
+    jobs = [(ch, {t['uid']: cands[t['uid']] for t in ch}, cal, mode, tea_idx) for ch in chunks]
+    with ProcessPoolExecutor(max_workers=workers) as pool: parts = list(pool.map(_occupancy_chunk, jobs))
+    # รวมผล: เลื่อนเลข candidate ของแต่ละ chunk ต่อจาก chunk ก่อนหน้า
+    off, cls, tea = 0, [], []
+    for part in parts:
+        cls.append(part['cls'] + [off, 0, 0, 0]); tea.append(part['tea'] + [off, 0, 0, 0, 0])
+        off += part['n']
+    return {'n': off, 'ext': np.concatenate([p['ext'] for p in parts]), 'cls': np.concatenate(cls),
+            'tea': np.concatenate(tea)}, tea_idx
+
+def group_rows(rows, key_cols):
+    """(keys, [candidate ids]) of ``rows`` grouped on ``key_cols``; column 0 is the candidate id."""
+    if not len(rows): return np.zeros((0, len(key_cols)), dtype=np.int64), []
+    rows = rows[np.lexsort(rows[:, key_cols[::-1]].T)]
+    keys = rows[:, key_cols]
+    starts = np.concatenate([[0], np.flatnonzero((np.diff(keys, axis=0) != 0).any(axis=1)) + 1])
+    return keys[starts], np.split(rows[:, 0], starts[1:])
+
+def resource_cliques(keys, groups, caps):
+    """[(candidate ids, cap)] for one resource kind: a set per (resource, day, slot) that can overflow.
+
+    ``keys``/``groups`` come from ``group_rows`` sorted by resource, day and
+    slot. A slot whose set is contained in the set of the slot before or
+    after it is dominated (same resource, same cap) and is dropped. Long
+    tasks make consecutive slots share most of their literals, so most
+    slots go."""
+    out, sets, rows = [], [frozenset(g.tolist()) for g in groups], keys.tolist()
+    for i, (r, d, _) in enumerate(rows):
+        cur = sets[i]
+        if len(cur) <= caps[r]: continue
+        if i > 0 and rows[i - 1][:2] == [r, d] and cur <= sets[i - 1]: continue            # ซ้ำ/อยู่ในคาบก่อนหน้า
+        if i + 1 < len(rows) and rows[i + 1][:2] == [r, d] and cur < sets[i + 1]: continue  # อยู่ในคาบถัดไป
+        out.append((cur, caps[r]))
+    return out
+
+def merge_cliques(cliques):
+    """Drop duplicates across resources: a teacher clique equal to a single-room
+    clique (or another teacher's, for co-taught tasks) is posted once."""
+    seen, out = set(), []
+    for ids, cap in cliques:
+        if (ids, cap) in seen: continue
+        seen.add((ids, cap)); out.append((sorted(ids), cap))
+    return out
+
+def add_cliques(model, cliques):
+    """Post [(literals, cap)] overlap sets the way every model does: AtMostOne
+    for cap 1, a linear <= cap otherwise; sets that cannot overflow and
+    duplicates are skipped. Returns the number posted."""
+    seen, n = set(), 0
+    for lits, cap in cliques:
+        key = (frozenset(v.Index() for v in lits), cap)
+        if len(lits) <= cap or key in seen: continue
+        seen.add(key); n += 1
+        if cap == 1: model.AddAtMostOne(lits)
+        else: model.Add(cp_model.LinearExpr.sum(lits) <= cap)
+    return n
+
+def add_part_links(model, problem, lits, is_sched):
+    """Constraints between the parts of one lecture section.
+
+    ``lits``: uid -> [(literal, class or None, day, start)]. Parts never
+    share a day. Leading equal-length parts are interchangeable: a later
+    part needs the earlier one scheduled, on an earlier day (symmetry
+    breaking). ``problem['part_link']`` 'start' also keeps the start time
+    and 'room' the room class (models with class literals only) the same
+    across parts. Returns the number of constraints added."""
+    link, rank, n = problem.get('part_link'), part_rank(problem), 0
+    def expr(u, pos):
+        return cp_model.LinearExpr.weighted_sum([k[0] for k in lits[u]], [k[pos] for k in lits[u]])
+    for uids in problem.get('part_groups', {}).values():
+        uids = [u for u in uids if u in lits]
+        if len(uids) < 2: continue
+        for d in range(len(problem['days'])):
+            day_lits = [k[0] for u in uids for k in lits[u] if k[2] == d]
+            if len(day_lits) > 1: model.AddAtMostOne(day_lits); n += 1
+        for a, b in zip(uids, uids[1:]):
+            both = [is_sched[a], is_sched[b]]
+            if a in rank and b in rank:
+                model.AddImplication(is_sched[b], is_sched[a])
+                model.Add(expr(a, 2) + 1 <= expr(b, 2)).OnlyEnforceIf(is_sched[b]); n += 2
+            if link == 'start':
+                model.Add(expr(a, 3) == expr(b, 3)).OnlyEnforceIf(both); n += 1
+            elif link == 'room' and lits[a] and lits[a][0][1] is not None:
+                model.Add(expr(a, 1) == expr(b, 1)).OnlyEnforceIf(both); n += 1
+    return n
+
+def parts_linked(problem, placed):
+    """True if ``placed`` keeps every section's parts on distinct days (and the ``part_link`` start/room class)."""
+    link = problem.get('part_link')
+    for uids in problem.get('part_groups', {}).values():
+        got = [placed[u] for u in uids if u in placed]
+        if len({d for _, d, _ in got}) < len(got): return False
+        if link == 'start' and len({s for _, _, s in got}) > 1: return False
+        if link == 'room' and len({c for c, _, _ in got}) > 1: return False
+    return True
+
+def build_model(problem, cands, penalty_score, workers=None):
+    """Joint CP-SAT model. Slot occupancy is computed as arrays (``model_occupancy``,
+    in ``workers`` processes if given, else ``problem['build_workers']``) and
+    assembled into the model in one pass."""
+    model = cp_model.CpModel()
+    x, is_sched = {}, {}
+    obj_terms, pen_terms = [], []
+    classes = problem['classes']
+    travel = problem.get('travel_slots', 0)
+    occ, tea_idx = model_occupancy(problem, cands, workers or problem.get('build_workers'))
+
+    lit = []  # candidate id -> literal (ลำดับเดียวกับ occupancy_rows)
+    linked = {u: [] for uids in problem.get('part_groups', {}).values() for u in uids}
+    for t in problem['tasks']:
+        uid = t['uid']
+        is_sched[uid] = model.NewBoolVar(f"sc_{uid}")
+        lits = []
+        for (c, d, s) in cands[uid]:
+            v = model.NewBoolVar(f"{uid}_{classes[c]['cid']}_{d}_{s}")
+            x[(uid, c, d, s)] = v; lits.append(v)
+            if uid in linked: linked[uid].append((v, c, d, s))
+        lit.extend(lits)
+        model.Add(cp_model.LinearExpr.sum(lits) == is_sched[uid])
+        obj_terms.append(is_sched[uid] * task_weight(t))
+    if penalty_score: pen_terms = [lit[i] * penalty_score for i in np.flatnonzero(occ['ext'])]
+
+    # ห้องในคลาสเดียวกันใช้แทนกันได้: จำนวนคาบซ้อนกันต้องไม่เกินจำนวนห้อง; อาจารย์สอนได้ทีละวิชา
+    keys, groups = group_rows(occ['cls'], [1, 2, 3])
+    cliques = resource_cliques(keys, groups, [len(classes[c]['rooms']) for c in range(len(classes))])
+    keys, groups = group_rows(occ['tea'], [1, 2, 3])
+    cliques += resource_cliques(keys, groups, [1] * len(tea_idx))
+    add_cliques(model, [([lit[j] for j in ids], cap) for ids, cap in merge_cliques(cliques)])
+    if travel:
+        bld, tea_of = class_buildings(classes), sorted(tea_idx, key=tea_idx.get)
+        tea_bld = defaultdict(lambda: defaultdict(list))
+        for j, tid, d, i, c in occ['tea'].tolist():
+            if c in bld: tea_bld[(tea_of[tid], d, i)][bld[c]].append(lit[j])
+        add_travel_constraints(model, tea_bld, travel)
+    add_part_links(model, problem, {u: v for u, v in linked.items() if u in is_sched}, is_sched)
+
+    model.Maximize(sum(obj_terms) - sum(pen_terms))
+    return model, {'x': x, 'is_sched': is_sched}
+
+def assign_rooms(problem, placed):
+    """Turn (class, day, start) placements into concrete rooms.
+
+    Within a class and day this is interval colouring; because the model
+    keeps overlap <= number of rooms, greedy by start time always succeeds."""
+    by_cd, task_of = defaultdict(list), {t['uid']: t for t in problem['tasks']}
+    for uid, (c, d, s) in placed.items(): by_cd[(c, d)].append((s, s + task_of[uid]['dur'], uid))
+    rooms = {t['uid']: t['target_room'] for t in problem['fixed_tasks']}
+    # part_link='room': ส่วนของ section เดียวกันได้ห้องเดิมถ้าห้องนั้นว่าง (ห้องไหนว่างก็ใช้ได้ ผลไม่เสีย)
+    siblings = {u: uids for uids in problem.get('part_groups', {}).values() for u in uids} if problem.get('part_link') == 'room' else {}
+    for (c, d), items in by_cd.items():
+        free_at = {rm: 0 for rm in problem['classes'][c]['rooms']}
+        for s, e, uid in sorted(items):
+            pref = [rooms[u] for u in siblings.get(uid, []) if u in rooms and rooms[u] in free_at and free_at[rooms[u]] <= s]
+            rm = pref[0] if pref else next((r for r in free_at if free_at[r] <= s), None)
+            if rm is None: rm = "Unknown"
+            else: free_at[rm] = e
+            rooms[uid] = rm
+    return rooms
+
+def iter_result(problem, placed):
+    """Yield a ``ScheduleRow`` per placed task (fixed rows first) without building a list."""
+    cal, DAYS = problem['cal'], problem['days']
+    rooms = assign_rooms(problem, placed)
+    placed = {**problem.get('fixed_placed', {}), **placed}
+    for t in problem['fixed_tasks'] + problem['tasks']:
+        if t['uid'] not in placed: continue
+        _, d, s = placed[t['uid']]
+        yield ScheduleRow(DAYS[d], cal['times'][s], cal['times'][s+t['dur']], str(rooms[t['uid']]), str(t['id']), int(t['sec']),
+                          t.get('type','-'), ",".join(t['tea']), "Ext.Time" if is_ext_time(cal, s, t['dur']) else "")
+
+def build_result(problem, placed, core_budget=None):
+    """Result DataFrame; ``core_budget`` caps the blocker search of ``explain_unscheduled`` (0 skips it)."""
+    df = pd.DataFrame.from_records(iter_result(problem, placed), columns=ScheduleRow._fields)
+    df.attrs['fixed_clashes'] = problem.get('fixed_clashes', [])  # แถว fixed ที่ชนกันเอง/อยู่นอกตาราง
+    from diagnostics import CORE_BUDGET, explain_unscheduled  # import ในฟังก์ชัน: diagnostics ใช้ scheduler_engine
+    df.attrs['unscheduled'] = explain_unscheduled(problem, placed, core_budget=CORE_BUDGET if core_budget is None else core_budget)
+    df.attrs['rooms'] = [str(r['room']) for r in problem['rooms'] if r.get('type') != 'virtual']
+    df.attrs['cohorts'] = {f"{t['id']}|{t['sec']}": t.get('cohort', '') for t in problem['fixed_tasks'] + problem['tasks']}
+    return df
+
+def placement_objective(problem, placed, penalty_score):
+    """Objective value of a placement, as the CP-SAT models score it."""
+    task_of = {t['uid']: t for t in problem['tasks']}
+    pen = penalty_score if problem['mode'] == 2 else 0
+    return sum(task_weight(task_of[uid]) - (pen if is_ext_time(problem['cal'], s, task_of[uid]['dur']) else 0)
+               for uid, (_, _, s) in placed.items())
+
+class ProgressCallback(cp_model.CpSolverSolutionCallback):
+    """Forwards every improving solution to ``progress({'objective', 'wall_time'})``."""
+    def __init__(self, progress, offset=0.0):
+        super().__init__()
+        self._progress, self._offset = progress, offset
+
+    def on_solution_callback(self):
+        self._progress({'objective': self.ObjectiveValue(), 'wall_time': self._offset + self.WallTime()})
+
+def solve_model(model, solver_time, progress=None):
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = solver_time # ตัวแปรเวลาประมวลผล
+    status = solver.Solve(model, ProgressCallback(progress) if progress else None)
+    return solver, status
+
+def add_placement_hint(model, index, placed):
+    """Hint every placement literal and is_sched with an existing uid -> (class, day, start) solution."""
+    for (uid, c, d, s), v in index['x'].items(): model.AddHint(v, int(placed.get(uid) == (c, d, s)))
+    for uid, v in index['is_sched'].items(): model.AddHint(v, int(uid in placed))
+
+def solve_joint(problem, solver_time, penalty_score, progress=None, hint=None):
+    """Single CP-SAT model over (task, room class, day, start); returns uid -> (class, day, start) or None."""
+    cands = build_candidates(problem)
+    model, index = build_model(problem, cands, penalty_score)
+    if hint: add_placement_hint(model, index, hint)
+    solver, status = solve_model(model, solver_time, progress)
+    if status in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
+        return {k[0]: k[1:] for k, v in index['x'].items() if solver.Value(v)}
+    return None
+
+ENGINES = ['joint', 'two_phase', 'lns', 'greedy', 'coarse_to_fine', 'lexicographic']
+
+def solve_problem(problem, engine, solver_time, penalty_score, progress=None, warm_start=False, stage_times=None):
+    """Run one engine on a built problem; uid -> (class, day, start) or None."""
+    if engine == 'two_phase':
+        from two_phase_engine import solve_two_phase
+        return solve_two_phase(problem, solver_time, penalty_score, progress=progress)
+    elif engine == 'lns':
+        from lns_engine import solve_lns
+        return solve_lns(problem, solver_time, penalty_score, progress=progress)
+    elif engine == 'coarse_to_fine':
+        from coarse_to_fine_engine import solve_coarse_to_fine
+        return solve_coarse_to_fine(problem, solver_time, penalty_score, progress=progress)
+    elif engine == 'lexicographic':
+        from lexicographic_engine import solve_lexicographic
+        return solve_lexicographic(problem, solver_time, penalty_score, stage_times, progress=progress)
+    elif engine == 'greedy':
+        from greedy_engine import solve_greedy
+        placed = solve_greedy(problem)
+        if progress: progress({'objective': placement_objective(problem, placed, penalty_score), 'wall_time': 0.0})
+        return placed
+    hint = None
+    if warm_start:
+        from greedy_engine import solve_greedy
+        hint = solve_greedy(problem)
+    return solve_joint(problem, solver_time, penalty_score, progress=progress, hint=hint)
+
+MAX_WIDEN = 3 # candidate budget ขยาย (x2) ได้กี่ครั้งเมื่อวิชาบังคับจัดไม่ได้
+
+def calculate_schedule(files, mode, solver_time, penalty_score, engine='joint', progress=None, warm_start=False, calendar=None, stage_times=None, dump_path=None, reserved=None, travel_minutes=0, candidate_budget=None, build_workers=None, link_parts=None):
+    """``progress``, if given, is called with {'objective', 'wall_time'} on every improving solution.
+    Malformed input raises ``DatasetError`` with row-level detail instead of returning None.
+
+    engine='greedy' ignores ``solver_time`` and returns in well under a second
+    (its result lists unscheduled reasons without ``Blockers``);
+    ``warm_start`` hints the joint model with the greedy timetable.
+    ``calendar`` overrides the time grid (see ``slot_calendar.DEFAULT_CALENDAR``).
+    engine='lexicographic' optimizes mandatory > optional > Ext.Time in
+    stages; ``stage_times`` ({stage: seconds}) overrides its time split.
+    ``dump_path`` saves the joint model and its index (``model_dump``) for
+    offline replay, whatever engine is used. ``reserved`` is occupancy held by
+    other runs (see ``build_problem`` and ``batch_scheduler``).
+    ``travel_minutes`` > 0 keeps that much time between a teacher's classes
+    in different buildings (``room.csv`` column ``building``).
+    ``candidate_budget`` K keeps only the K best-ranked placements per task
+    (``rank_candidates``). If a mandatory task ends up unscheduled while one
+    of its dropped placements is still free, K is doubled and the problem solved again, up to
+    ``MAX_WIDEN`` times, all rounds within one ``solver_time``: each round gets
+    half of the time left, the last possible round all of it. The final K is
+    reported in ``df.attrs['candidate_budget']``.
+    ``build_workers`` > 1 computes the slot occupancy of CP-SAT models in
+    that many processes (``model_occupancy``).
+    Parts of a long lecture (``..._Lec_P1``, ``_P2``) always go on different
+    days. ``link_parts`` 'start' or 'room' also gives them the same start
+    time or room class (``add_part_links``)."""
     try:
-        # Load Data
-        df_room = pd.read_csv(files['room'])
-        room_list = df_room.to_dict('records')
-        room_list.append({'room': 'Online', 'capacity': 9999, 'type': 'virtual'})
-        df_tc = pd.read_csv(files['teacher_courses'])
-        df_courses = pd.concat([pd.read_csv(files['ai_in']), pd.read_csv(files['cy_in'])], ignore_index=True).fillna(0)
-        df_teacher = pd.read_csv(files['all_teachers'])
-
-        t_map = defaultdict(list)
-        for _, r in df_tc.iterrows(): t_map[str(r['course_code']).strip()].append(str(r['teacher_id']).strip())
-        un_map = {str(r['teacher_id']).strip(): parse_unavailable_time(r.get('unavailable_times'), DAYS, SLOT_INV) for _, r in df_teacher.iterrows()}
-
-        # 1. Fixed Schedule (ai_out, cy_out)
-        fixed_tasks = []
-        for key in ['ai_out', 'cy_out']:
-            if files[key] is not None:
-                df_f = pd.read_csv(files[key])
-                for _, r in df_f.iterrows():
-                    d_i = DAYS.index(str(r['day'])[:3]) if str(r['day'])[:3] in DAYS else -1
-                    s_i = SLOT_INV.get(str(r['start']).replace('.', ':'), -1)
-                    dur = int(math.ceil((r.get('lecture_hour', 0) + r.get('lab_hour', 0)) * 2))
-                    if d_i != -1 and s_i != -1:
-                        fixed_tasks.append({
-                            'uid': f"FIX_{r['course_code']}_{r['section']}", 'id': str(r['course_code']), 
-                            'sec': int(r['section']), 'dur': dur, 'type': 'Fixed',
-                            'tea': t_map.get(str(r['course_code']).strip(), ['-']),
-                            'fixed_room': True, 'target_room': str(r['room']), 'f_d': d_i, 'f_s': s_i
-                        })
-
-        # 2. Dynamic Tasks
-        tasks = []
-        for _, r in df_courses.iterrows():
-            c, s = str(r['course_code']).strip(), int(r['section'])
-            tea, opt = t_map.get(c, ['Unknown']), r.get('optional', 1)
-            lec_slots = int(math.ceil(r['lecture_hour'] * 2))
-            p = 1
-            while lec_slots > 0:
-                dur = min(lec_slots, 6)
-                uid = f"{c}_S{s}_Lec_P{p}"
-                if not any(tk['uid'] == uid for tk in fixed_tasks):
-                    tasks.append({'uid': uid, 'id': c, 'sec': s, 'type': 'Lec', 'dur': dur, 'std': r['enrollment_count'], 'tea': tea, 'opt': opt, 'online': r.get('lec_online')==1})
-                lec_slots -= dur; p += 1
-            lab_dur = int(math.ceil(r['lab_hour'] * 2))
-            if lab_dur > 0:
-                uid = f"{c}_S{s}_Lab"
-                if not any(tk['uid'] == uid for tk in fixed_tasks):
-                    tasks.append({'uid': uid, 'id': c, 'sec': s, 'type': 'Lab', 'dur': lab_dur, 'std': r['enrollment_count'], 'tea': tea, 'opt': opt, 'online': r.get('lab_online')==1})
-
-        # 3. Solver Setup
-        model = cp_model.CpModel()
-        vars, is_sched, task_vars = {}, {}, {}
-        room_lookup = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
-        tea_lookup = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
-        obj_terms, pen_terms = [], []
-
-        for t in (fixed_tasks + tasks):
-            uid = t['uid']
-            is_sched[uid] = model.NewBoolVar(f"sc_{uid}")
-            t_d, t_s = model.NewIntVar(0, 4, f"d_{uid}"), model.NewIntVar(0, TOTAL_SLOTS-1, f"s_{uid}")
-            model.Add(model.NewIntVar(0, TOTAL_SLOTS+1, f"e_{uid}") == t_s + t['dur'])
-            task_vars[uid] = {'d': t_d, 's': t_s}
-            if t.get('fixed_room'):
-                model.Add(t_d == t['f_d']); model.Add(t_s == t['f_s'])
-
-            cands = []
-            for r in room_list:
-                if t.get('online') and r['room'] != 'Online': continue
-                if not t.get('online') and (r['room'] == 'Online' or r['capacity'] < t.get('std', 0)): continue
-                if t.get('fixed_room') and r['room'] != t['target_room']: continue
-                if t.get('type') == 'Lab' and 'lab' not in str(r.get('type','')).lower(): continue
-
-                for d in range(5):
-                    for s in range(TOTAL_SLOTS - t['dur']):
-                        sv, ev = SLOT_MAP[s]['val'], SLOT_MAP[s]['val'] + (t['dur']*0.5)
-                        if mode == 1 and (sv < 9.0 or ev > 16.0): continue
-                        if any(SLOT_MAP[s+i]['is_lunch'] for i in range(t['dur'])): continue
-                        if any(tid in un_map and s+i in un_map[tid][d] for tid in t['tea'] for i in range(t['dur'])): continue
-
-                        v = model.NewBoolVar(f"{uid}_{r['room']}_{d}_{s}")
-                        cands.append(v); vars[(uid, r['room'], d, s)] = v
-                        model.Add(t_d == d).OnlyEnforceIf(v); model.Add(t_s == s).OnlyEnforceIf(v)
-                        if mode == 2 and (sv < 9.0 or ev > 16.0): pen_terms.append(v * penalty_score)
-                        for i in range(t['dur']):
-                            room_lookup[r['room']][d][s+i].append(v)
-                            for tid in t['tea']: tea_lookup[tid][d][s+i].append(v)
-
-            if cands: model.Add(sum(cands) == 1).OnlyEnforceIf(is_sched[uid])
-            else: model.Add(is_sched[uid] == 0)
-            obj_terms.append(is_sched[uid] * (1000000 if t.get('fixed_room') else (1000 if t.get('opt')==0 else 100)))
-
-        for lookup in [room_lookup, tea_lookup]:
-            for k in lookup:
-                for d in lookup[k]:
-                    for s in lookup[k][d]:
-                        if len(lookup[k][d][s]) > 1: model.Add(sum(lookup[k][d][s]) <= 1)
-
-        model.Maximize(sum(obj_terms) - sum(pen_terms))
-        solver = cp_model.CpSolver()
-        solver.parameters.max_time_in_seconds = solver_time # ตัวแปรเวลาประมวลผล
-        status = solver.Solve(model)
-
-        res_final = []
-        if status in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
-            for t in (fixed_tasks + tasks):
-                if solver.Value(is_sched[t['uid']]):
-                    d, s = solver.Value(task_vars[t['uid']]['d']), solver.Value(task_vars[t['uid']]['s'])
-                    rm = next((k[1] for k, v in vars.items() if k[0] == t['uid'] and k[2] == d and k[3] == s and solver.Value(v)), "Unknown")
-                    res_final.append({'Day': DAYS[d], 'Start': SLOT_MAP[s]['time'], 'End': SLOT_MAP[s+t['dur']]['time'], 'Room': rm, 'Course': t['id'], 'Sec': t['sec'], 'Type': t.get('type','-'), 'Teacher': ",".join(t['tea']), 'Note': "Ext.Time" if (SLOT_MAP[s]['val'] < 9.0 or SLOT_MAP[s+t['dur']-1]['val'] >= 16.0) else ""})
-            return pd.DataFrame(res_final)
-        return None
+        problem = build_problem(files, mode, calendar, reserved)
+        if travel_minutes: problem['travel_slots'] = duration_slots(problem['cal'], travel_minutes / 60)
+        if candidate_budget: problem['candidate_budget'] = int(candidate_budget)
+        if build_workers: problem['build_workers'] = int(build_workers)
+        if link_parts: problem['part_link'] = link_parts
+        if dump_path:
+            from model_dump import export_model
+            export_model(dump_path, *build_model(problem, build_candidates(problem), penalty_score), problem, penalty_score)
+        # candidate budget: ทุกรอบใช้เวลารวมกันไม่เกิน solver_time (รอบละครึ่งหนึ่งของที่เหลือ รอบสุดท้ายใช้ที่เหลือทั้งหมด)
+        deadline = time.perf_counter() + solver_time
+        round_time = lambda last: max(0.5, deadline - time.perf_counter()) / (1 if last else 2)
+        placed = solve_problem(problem, engine, round_time(False) if candidate_budget else solver_time,
+                               penalty_score, progress, warm_start, stage_times)
+        rounds, full = 1, build_candidates({**problem, 'candidate_budget': None}) if candidate_budget else None
+        while candidate_budget and placed is not None and rounds <= MAX_WIDEN:
+            from diagnostics import pruned_losses
+            # ขยายเฉพาะเมื่อวิชาบังคับหลุดทั้งที่ตัวเลือกที่ถูกตัดทิ้งยังว่างอยู่
+            if not pruned_losses(problem, placed, full, build_candidates(problem)): break
+            problem['candidate_budget'] *= 2
+            rounds += 1
+            placed = solve_problem(problem, engine, round_time(rounds > MAX_WIDEN), penalty_score, progress, warm_start, stage_times)
+        if placed is None: return None
+        df = build_result(problem, placed, core_budget=0 if engine == 'greedy' else None)  # preview: ไม่หา blockers
+        if candidate_budget:
+            budget, kept = problem['candidate_budget'], build_candidates(problem)  # รวมตัวเลือกที่เก็บเพิ่มให้ส่วนบรรยายเริ่มพร้อมกัน
+            df.attrs['candidate_budget'] = {'k': budget, 'rounds': rounds, 'literals': sum(len(v) for v in kept.values()),
+                                            'literals_full': sum(len(v) for v in full.values()),
+                                            'pruned_tasks': sum(len(v) > budget for v in full.values())}
+        return df
+    except DatasetError:
+        raise # ข้อมูลผิดรูปแบบต้องแจ้งผู้ใช้ ไม่ใช่ "หาคำตอบไม่ได้"
     except Exception as e:
         return None
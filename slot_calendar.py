@@ -0,0 +1,95 @@
+"""Configurable time grid compiled to integer slot arrays.
+
+A calendar config says which days exist, the teaching window per day, the
+slot length, the lunch break and the "core" window (placements outside it
+are Ext.Time). ``compile_calendar`` turns that into arrays indexed by slot
+once, and the engine, the unavailable-time parser and the timetable
+renderers all read from the compiled form.
+
+    cal = compile_calendar({'slot_minutes': 15, 'days': ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat'],
+                            'day_hours': {'Sat': ('08:30', '12:30')}})
+"""
+import re
+
+import numpy as np
+
+DEFAULT_CALENDAR = {
+    'days': ['Mon', 'Tue', 'Wed', 'Thu', 'Fri'],
+    'start': '08:30',
+    'end': '19:00',
+    'slot_minutes': 30,
+    'lunch': ('12:30', '13:00'),
+    'core': ('09:00', '16:00'),  # นอกช่วงนี้ = Ext.Time
+    'day_hours': {},             # เช่น {'Sat': ('08:30', '12:30')}
+}
+
+def to_minutes(hhmm):
+    """'9:00' / '09.30' -> minutes after midnight, or None."""
+    m = re.fullmatch(r"\s*(\d{1,2})[:.](\d{2})\s*", str(hhmm))
+    return int(m.group(1)) * 60 + int(m.group(2)) if m else None
+
+def fmt_minutes(mins):
+    return f"{mins // 60:02d}:{mins % 60:02d}"
+
+def compile_calendar(config=None):
+    """Merge ``config`` over ``DEFAULT_CALENDAR`` and precompute slot arrays.
+
+    ``minutes[i]`` is the start of slot i; there are ``n_slots`` slots and
+    ``n_slots + 1`` boundaries in ``times`` so that ``times[s + dur]`` is the
+    end of a task. ``open[d, i]`` is False for lunch and for slots outside
+    that day's hours, ``core[i]`` marks slots inside the core window.
+    ``config`` keeps the merged settings so a grid can be recompiled at
+    another resolution."""
+    if config is not None and 'open' in config: return config  # already compiled
+    cfg = {**DEFAULT_CALENDAR, **(config or {})}
+    step = int(cfg['slot_minutes'])
+    t0, t1 = to_minutes(cfg['start']), to_minutes(cfg['end'])
+    if step <= 0 or t0 is None or t1 is None or t1 <= t0:
+        raise ValueError(f"ตั้งค่าตารางเวลาไม่ถูกต้อง: {cfg['start']}-{cfg['end']} ทุก {step} นาที")
+    n_slots = (t1 - t0) // step
+    minutes = t0 + step * np.arange(n_slots + 1)
+    starts, ends = minutes[:-1], minutes[1:]
+
+    l0, l1 = (to_minutes(x) for x in cfg['lunch']) if cfg.get('lunch') else (0, 0)
+    lunch = (starts < l1) & (ends > l0)
+    c0, c1 = (to_minutes(x) for x in cfg['core'])
+    core = (starts >= c0) & (ends <= c1)
+
+    days = list(cfg['days'])
+    open_ = np.tile(~lunch, (len(days), 1))
+    for d, name in enumerate(days):
+        if name in cfg['day_hours']:
+            h0, h1 = (to_minutes(x) for x in cfg['day_hours'][name])
+            open_[d] &= (starts >= h0) & (ends <= h1)
+
+    times = [fmt_minutes(int(m)) for m in minutes]
+    return {'days': days, 'slot_minutes': step, 'n_slots': n_slots, 'minutes': minutes,
+            'times': times, 'index': {t: i for i, t in enumerate(times)},
+            'lunch': lunch, 'core': core, 'open': open_, 'core_window': (c0, c1), 'config': cfg}
+
+def duration_slots(cal, hours):
+    """Number of slots needed for ``hours`` (rounded up to the grid)."""
+    return int(-(-round(float(hours) * 60) // cal['slot_minutes']))
+
+def slot_of(cal, hhmm):
+    """Slot index of a start time that lies on the grid, else -1."""
+    mins = to_minutes(hhmm)
+    return cal['index'].get(fmt_minutes(mins), -1) if mins is not None else -1
+
+def slots_between(cal, start, end):
+    """Slot indices overlapping [start, end) (times as strings); used for unavailable ranges."""
+    s, e = to_minutes(start), to_minutes(end)
+    if s is None or e is None: return []
+    starts = cal['minutes'][:-1]
+    return np.flatnonzero((starts < e) & (starts + cal['slot_minutes'] > s)).tolist()
+
+def window_ok(mask, dur):
+    """mask: (..., n_slots) bool -> (..., n_slots - dur + 1) bool, True where mask[s:s+dur] is all True."""
+    if dur <= 0 or dur > mask.shape[-1]: return np.zeros(mask.shape[:-1] + (0,), dtype=bool)
+    c = np.concatenate([np.zeros(mask.shape[:-1] + (1,), dtype=int), np.cumsum(~mask, axis=-1)], axis=-1)
+    return (c[..., dur:] - c[..., :-dur]) == 0
+
+def is_ext_time(cal, s, dur):
+    """True if a task starting at slot ``s`` leaves the core window."""
+    c0, c1 = cal['core_window']
+    return int(cal['minutes'][s]) < c0 or int(cal['minutes'][s + dur]) > c1
@@ -0,0 +1,150 @@
+import time
+from ortools.sat.python import cp_model
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
+
+from scheduler_engine import (build_candidates, is_ext_time, task_weight, solve_joint, solve_model,
+                              class_buildings, add_travel_constraints, add_part_links, parts_linked, add_cliques)
+
+# ==========================================
+# Phase 1: day/start only
+# ==========================================
+def build_time_model(problem, cands, penalty_score):
+    """Time-only model: one literal per (task, day, start).
+
+    Rooms are represented by Hall-style capacity cuts: for every distinct
+    eligibility set E, tasks that can only use classes in E may not overlap
+    more than the number of rooms in E. For capacity-threshold eligibility
+    (the usual case) the sets are nested and the cuts are exact. Classes
+    blocked by reservations (``problem['room_blocked']``) do not count
+    towards E's capacity at the blocked slots."""
+    model = cp_model.CpModel()
+    y, is_sched, elig = {}, {}, {}
+    tea_lookup = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+    set_lookup = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+    obj_terms, pen_terms = [], []
+    classes, cal = problem['classes'], problem['cal']
+    all_tasks = problem['tasks']
+
+    for t in all_tasks:
+        elig[t['uid']] = frozenset(c for c, _, _ in cands[t['uid']])
+    elig_sets = set(elig.values()) - {frozenset()}
+    sizes = {E: sum(len(classes[c]['rooms']) for c in E) for E in elig_sets}
+    # E ที่ครอบคลุม eligibility ของงานนี้ (งานนี้กินที่ใน E เสมอ)
+    covers = {e: [E for E in elig_sets if e <= E] for e in elig_sets}
+
+    linked = {u: [] for uids in problem.get('part_groups', {}).values() for u in uids if u in elig}
+    for t in all_tasks:
+        uid = t['uid']
+        is_sched[uid] = model.NewBoolVar(f"sc_{uid}")
+        lits = []
+        for (d, s) in sorted({(d, s) for _, d, s in cands[uid]}):
+            v = model.NewBoolVar(f"{uid}_{d}_{s}")
+            y[(uid, d, s)] = v; lits.append(v)
+            if uid in linked: linked[uid].append((v, None, d, s))
+            if problem['mode'] == 2 and is_ext_time(cal, s, t['dur']): pen_terms.append(v * penalty_score)
+            for i in range(t['dur']):
+                for tid in t['tea']: tea_lookup[tid][d][s+i].append(v)
+                for E in covers.get(elig[uid], []): set_lookup[E][d][s+i].append(v)
+        model.Add(sum(lits) == is_sched[uid])
+        obj_terms.append(is_sched[uid] * task_weight(t))
+
+    blocked, cliques = problem.get('room_blocked', {}), []
+    for E in set_lookup:
+        in_E = [c for c in E if c in blocked]
+        for d in set_lookup[E]:
+            for s, lits in set_lookup[E][d].items():
+                cliques.append((lits, sizes[E] - sum(len(classes[c]['rooms']) for c in in_E if blocked[c][d, s])))
+    cliques += [(lits, 1) for k in tea_lookup for d in tea_lookup[k] for lits in tea_lookup[k][d].values()]
+    add_cliques(model, cliques)
+    add_part_links(model, problem, linked, is_sched)  # ห้องเดียวกัน ('room') ตรวจหลัง phase 2
+
+    model.Maximize(sum(obj_terms) - sum(pen_terms))
+    return model, {'y': y, 'is_sched': is_sched, 'elig': elig}
+
+# ==========================================
+# Phase 2: rooms per day
+# ==========================================
+def assign_classes_for_day(problem, day_items, elig, time_limit):
+    """day_items: [(uid, start, dur)] on one day -> uid -> class index, or None if no assignment exists.
+
+    With ``problem['travel_slots']`` set, building changes between a
+    teacher's classes on this day are constrained as in the joint model."""
+    classes, travel = problem['classes'], problem.get('travel_slots', 0)
+    # งานที่มีห้องให้เลือกกลุ่มเดียวไม่ต้องเข้า solver
+    if not travel and all(len(elig[uid]) == 1 for uid, _, _ in day_items):
+        return {uid: next(iter(elig[uid])) for uid, _, _ in day_items}
+    tea = {t['uid']: t['tea'] for t in problem['tasks']}
+    bld = class_buildings(classes) if travel else {}
+    model = cp_model.CpModel()
+    z, occ = {}, defaultdict(lambda: defaultdict(list))
+    tea_bld = defaultdict(lambda: defaultdict(list))
+    for uid, s, dur in day_items:
+        lits = []
+        for c in sorted(elig[uid]):
+            v = model.NewBoolVar(f"{uid}_{c}")
+            z[(uid, c)] = v; lits.append(v)
+            for i in range(dur):
+                occ[c][s+i].append(v)
+                if c in bld:
+                    for tid in tea[uid]: tea_bld[(tid, 0, s+i)][bld[c]].append(v)
+        model.AddExactlyOne(lits)
+    add_cliques(model, [(lits, len(classes[c]['rooms'])) for c in occ for lits in occ[c].values()])
+    if travel: add_travel_constraints(model, tea_bld, travel)
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.num_workers = 1
+    if solver.Solve(model) not in [cp_model.OPTIMAL, cp_model.FEASIBLE]: return None
+    return {uid: c for (uid, c), v in z.items() if solver.Value(v)}
+
+def assign_rooms_by_day(problem, times, cands, phase2_time=10):
+    """uid -> (day, start) to uid -> (class, day, start), one phase-2 model per day in parallel; None if a day fails.
+
+    A task may only use the classes it has a candidate for at its chosen
+    day and start, so reserved rooms stay free."""
+    dur = {t['uid']: t['dur'] for t in problem['tasks']}
+    elig = {uid: frozenset(c for c, d, s in cands[uid] if (d, s) == ds) for uid, ds in times.items()}
+    by_day = defaultdict(list)
+    for uid, (d, s) in times.items(): by_day[d].append((uid, s, dur[uid]))
+    with ThreadPoolExecutor(max_workers=max(len(by_day), 1)) as pool:
+        futs = {d: pool.submit(assign_classes_for_day, problem, items, elig, phase2_time) for d, items in by_day.items()}
+        day_cls = {d: f.result() for d, f in futs.items()}
+    if any(v is None for v in day_cls.values()): return None
+    return {uid: (day_cls[d][uid], d, s) for d, items in by_day.items() for uid, s, _ in items}
+
+def assign_linked_rooms(problem, times, cands, phase2_time=10):
+    """``assign_rooms_by_day`` that also keeps ``part_link='room'``; None if no valid assignment.
+
+    Rooms are picked per day independently, so the parts of a section may
+    land in different room classes. Then every part is pinned to the class
+    of its section's first part and the days are assigned again."""
+    placed = assign_rooms_by_day(problem, times, cands, phase2_time)
+    if placed is not None and not parts_linked(problem, placed):
+        pin = {u: placed[uids[0]][0] for uids in problem['part_groups'].values() if uids[0] in placed for u in uids}
+        placed = assign_rooms_by_day(problem, times, {u: [k for k in v if k[0] == pin.get(u, k[0])] for u, v in cands.items()}, phase2_time)
+    return placed if placed is not None and parts_linked(problem, placed) else None
+
+PHASE1_SHARE = 0.7 # ส่วนของ solver_time สำหรับ phase 1; ที่เหลือสำหรับ phase 2 / fallback
+
+def solve_two_phase(problem, solver_time, penalty_score, phase2_time=10, progress=None, info=None):
+    """Phase 1 fixes day/start, phase 2 picks room classes per day in parallel.
+
+    Falls back to ``solve_joint`` when some day has no valid room assignment
+    or, with ``part_link='room'``, the parts of a section got different room classes.
+    ``info['optimal']`` is set when phase 1 was proven optimal and phase 2
+    succeeded, i.e. the result is optimal for the joint model as well.
+    Phase 1 (model build included) gets ``PHASE1_SHARE`` of ``solver_time``;
+    phase 2 and the fallback get what is left."""
+    t0 = time.perf_counter()
+    left = lambda share=1.0: max(0.5, solver_time * share - (time.perf_counter() - t0))
+    cands = build_candidates(problem)
+    model, index = build_time_model(problem, cands, penalty_score)
+    solver, status = solve_model(model, left(PHASE1_SHARE), progress)
+    if status not in [cp_model.OPTIMAL, cp_model.FEASIBLE]: return None
+
+    times = {uid: (d, s) for (uid, d, s), v in index['y'].items() if solver.Value(v)}
+    placed = assign_linked_rooms(problem, times, cands, min(phase2_time, left()))
+    if placed is None:
+        return solve_joint(problem, left(), penalty_score, progress=progress)
+    if info is not None: info['optimal'] = status == cp_model.OPTIMAL
+    return placed
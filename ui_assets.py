@@ -0,0 +1,200 @@
+"""Static UI assets shared by app.py and wub_app.py.
+
+Streamlit re-executes the page script on every interaction, but imported
+modules stay in ``sys.modules``: the constants here are built once per
+process (``existing_default_files`` checks the disk on every call). Keep this module free of pandas/OR-Tools imports so the first
+page renders before the solver stack is loaded.
+"""
+import os
+
+from slot_calendar import compile_calendar
+
+# ==========================================
+# DEFAULT DATA FILES
+# ==========================================
+DEFAULT_FILES = {
+    'room': 'room.csv',
+    'teacher_courses': 'teacher_courses.csv',
+    'ai_in': 'ai_in_courses.csv',
+    'cy_in': 'cy_in_courses.csv',
+    'all_teachers': 'all_teachers.csv',
+    'ai_out': 'ai_out_courses.csv',
+    'cy_out': 'cy_out_courses.csv'
+}
+
+def existing_default_files():
+    """ไฟล์ default ที่มีอยู่ในโฟลเดอร์ (ตรวจใหม่ทุกครั้ง: ไฟล์อาจถูกเพิ่มระหว่าง session)"""
+    return {key: name for key, name in DEFAULT_FILES.items() if os.path.exists(name)}
+
+CALENDAR = compile_calendar()
+
+# ==========================================
+# CSS
+# ==========================================
+APP_CSS = """
+<style>
+    .main-header {
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        padding: 2rem;
+        border-radius: 10px;
+        margin-bottom: 2rem;
+        color: white;
+        text-align: center;
+    }
+    .tt-container { 
+        overflow-x: auto; 
+        font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+        margin-top: 20px;
+        box-shadow: 0 4px 6px rgba(0,0,0,0.1);
+        border-radius: 8px;
+    }
+    .tt-table { 
+        width: 100%; 
+        border-collapse: collapse; 
+        min-width: 1200px;
+        background: white;
+    }
+    .tt-table th { 
+        background-color: #2c3e50 !important; 
+        color: white !important; 
+        border: 1px solid #34495e; 
+        text-align: center; 
+        padding: 12px 8px; 
+        font-size: 13px;
+        font-weight: 600;
+        position: sticky;
+        top: 0;
+        z-index: 11;
+    }
+    .tt-table td { 
+        border: 1px solid #dee2e6; 
+        text-align: center; 
+        padding: 4px; 
+        height: 80px;
+        background-color: #ffffff;
+    }
+    .tt-day { 
+        background-color: #34495e !important; 
+        color: white !important; 
+        font-weight: bold !important; 
+        width: 100px; 
+        position: sticky; 
+        left: 0; 
+        z-index: 12; 
+        border-right: 3px solid #2c3e50 !important; 
+        font-size: 14px;
+    }
+    .class-box { 
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        border-radius: 8px; 
+        padding: 8px; 
+        height: 95%; 
+        display: flex; 
+        flex-direction: column; 
+        justify-content: center; 
+        color: white !important; 
+        box-shadow: 0 2px 8px rgba(0,0,0,0.15);
+        font-size: 11px; 
+        line-height: 1.4;
+        transition: transform 0.2s;
+    }
+    .class-box:hover {
+        transform: translateY(-2px);
+        box-shadow: 0 4px 12px rgba(0,0,0,0.2);
+    }
+    .c-code { 
+        font-weight: 700; 
+        font-size: 13px; 
+        color: #ffffff !important;
+        text-shadow: 1px 1px 2px rgba(0,0,0,0.2);
+        margin-bottom: 4px;
+    }
+    .teacher-badge {
+        background-color: rgba(255,255,255,0.2);
+        padding: 2px 6px;
+        border-radius: 4px;
+        font-size: 10px;
+        margin-top: 4px;
+    }
+    .ext-time-badge {
+        background-color: #e74c3c;
+        color: white;
+        padding: 2px 6px;
+        border-radius: 3px;
+        font-size: 9px;
+        font-weight: bold;
+        margin-top: 4px;
+    }
+    .success-box {
+        background-color: #d4edda;
+        border: 1px solid #c3e6cb;
+        color: #155724;
+        padding: 1rem;
+        border-radius: 8px;
+        margin: 1rem 0;
+    }
+    .info-box {
+        background-color: #d1ecf1;
+        border: 1px solid #bee5eb;
+        color: #0c5460;
+        padding: 1rem;
+        border-radius: 8px;
+        margin: 1rem 0;
+    }
+    .stButton>button {
+        width: 100%;
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        color: white;
+        border: none;
+        padding: 0.75rem 1.5rem;
+        font-size: 16px;
+        font-weight: 600;
+        border-radius: 8px;
+        transition: all 0.3s;
+    }
+    .stButton>button:hover {
+        transform: translateY(-2px);
+        box-shadow: 0 6px 20px rgba(102, 126, 234, 0.4);
+    }
+</style>
+"""
+
+# wub_app.py (แก้ไขสีหัวตารางให้อ่านออกชัดเจน)
+WUB_CSS = """
+<style>
+    .tt-container { overflow-x: auto; font-family: 'Helvetica', sans-serif; margin-top: 20px; }
+    .tt-table { width: 100%; border-collapse: collapse; min-width: 1200px; }
+    
+    /* หัวตาราง: พื้นหลังเข้ม ฟอนต์ขาวชัดเจน */
+    .tt-table th { 
+        background-color: #343a40 !important; 
+        color: #ffffff !important; 
+        border: 1px solid #444; 
+        text-align: center; 
+        padding: 8px; 
+        font-size: 14px; 
+    }
+    
+    .tt-table td { border: 1px solid #dee2e6; text-align: center; padding: 4px; height: 75px; }
+
+    /* คอลัมน์ Day: พื้นหลังเทาอ่อน ฟอนต์ดำเข้ม */
+    .tt-day { 
+        background-color: #f8f9fa !important; 
+        color: #333333 !important; 
+        font-weight: bold !important; 
+        width: 80px; 
+        position: sticky; 
+        left: 0; 
+        z-index: 10; 
+        border-right: 2px solid #ccc !important; 
+        font-size: 14px !important;
+    }
+
+    .class-box { 
+        background-color: #e7f1ff; border: 1px solid #b6d4fe; border-radius: 6px;
+        padding: 4px; height: 95%; display: flex; flex-direction: column; justify-content: center;
+        color: #084298 !important; box-shadow: 1px 1px 3px rgba(0,0,0,0.1); font-size: 10px; line-height: 1.2;
+    }
+    .c-code { font-weight: bold; text-decoration: underline; font-size: 12px; color: #004085 !important; }
+</style>
+"""